@@ -0,0 +1,63 @@
+"""
+账号池取号基准：旧版 cycle 逐个 is_available() 与 AccountPool（dict + 最小堆）。
+池中 90% 账号处于冷却，模拟封号潮；同时统计响应回调按账号名查找的开销。
+在 weibospider 目录下运行：python -m benchmarks.bench_account_pool
+"""
+import logging
+import time
+from itertools import cycle
+
+from middlewares import AccountPool, AccountState
+
+logger = logging.getLogger('bench')
+
+
+def build_accounts(n, cooling_ratio=0.9):
+    accounts = [AccountState(f'acct_{i}', f'SUB=x{i}; XSRF-TOKEN=t{i}') for i in range(n)]
+    until = time.time() + 3600
+    for i, acc in enumerate(accounts):
+        if i % 10 < cooling_ratio * 10:
+            acc.status = 'cooldown'
+            acc.cooldown_until = until
+    return accounts
+
+
+def legacy_requests(accounts, n_requests):
+    it = cycle(accounts)
+    for _ in range(n_requests):
+        acc = None
+        for _ in range(len(accounts)):
+            cand = next(it)
+            if cand.is_available():
+                acc = cand
+                break
+        name = acc.account
+        # process_response 中按账号名线性查找
+        next(a for a in accounts if a.account == name).mark_success()
+
+
+def pool_requests(accounts, n_requests):
+    pool = AccountPool(accounts)
+    for _ in range(n_requests):
+        acc = pool.pick()
+        pool.mark_success(pool.get(acc.account))
+
+
+def per_request_us(func, accounts, n_requests):
+    start = time.perf_counter()
+    func(accounts, n_requests)
+    return (time.perf_counter() - start) / n_requests * 1e6
+
+
+def main():
+    print("-- 每次请求取号 + 回调查找耗时（微秒），90% 账号冷却中 --")
+    print(f"{'账号数':>8} {'cycle 扫描':>12} {'AccountPool':>12}")
+    for n in (10, 100, 1_000, 5_000):
+        n_requests = max(2_000, 200_000 // n)
+        legacy = per_request_us(legacy_requests, build_accounts(n), n_requests)
+        pooled = per_request_us(pool_requests, build_accounts(n), n_requests)
+        print(f"{n:>8} {legacy:>12.2f} {pooled:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
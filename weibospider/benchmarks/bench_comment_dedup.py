@@ -0,0 +1,103 @@
+"""
+评论去重状态基准：旧版（每楼一个 set + 永不释放的 max_id 字符串）与 CommentThread（有序 int64 数组，翻页结束释放）。
+- 常驻内存：按每百万条评论折算
+- 单楼插入耗时：升序、降序（flow=1 时间序）、乱序（flow=0 热度序）三种到达顺序
+在 weibospider 目录下运行：python -m benchmarks.bench_comment_dedup
+"""
+import gc
+import random
+import time
+import tracemalloc
+
+from spiders.comment import CommentThread
+
+BASE_ID = 5056748957731967
+
+
+def legacy_job(n_threads, per_thread, finish):
+    seen_comment_ids = {}
+    last_max_id = {}
+    for t in range(n_threads):
+        key = ('MzQ0NTQ5MjY0', str(BASE_ID + t * 10_000), 0)
+        seen = seen_comment_ids.setdefault(key, set())
+        for i in range(per_thread):
+            seen.add(BASE_ID + t * 10_000 + i)
+        last_max_id[('MzQ0NTQ5MjY0', 0, key[1])] = str(BASE_ID + t * 10_000 + per_thread)
+    # 旧版从不释放，finish 无效
+    return seen_comment_ids, last_max_id
+
+
+def compact_job(n_threads, per_thread, finish):
+    threads = {}
+    for t in range(n_threads):
+        key = (str(BASE_ID + t * 10_000), 0)
+        thread = threads[key] = CommentThread()
+        for i in range(per_thread):
+            thread.add(BASE_ID + t * 10_000 + i)
+            if i % 20 == 19:
+                # 每页 20 条
+                thread.end_page()
+        thread.end_page()
+        thread.last_max_id = BASE_ID + t * 10_000 + per_thread
+        if finish:
+            threads.pop(key)
+    return threads
+
+
+def measure(job, *args):
+    gc.collect()
+    tracemalloc.start()
+    state = job(*args)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del state
+    return current, peak
+
+
+def insert_orders(n):
+    ids = [BASE_ID + i * 7 for i in range(n)]
+    shuffled = list(ids)
+    random.Random(42).shuffle(shuffled)
+    return {'升序': ids, '降序': ids[::-1], '乱序': shuffled}
+
+
+def time_inserts(per_thread=200_000):
+    print(f"-- 单楼 {per_thread:,} 条评论的插入耗时（秒，含每条重复一次的去重判断）--")
+    for order, ids in insert_orders(per_thread).items():
+        seen = set()
+        start = time.perf_counter()
+        for comment_id in ids:
+            if comment_id not in seen:
+                seen.add(comment_id)
+            comment_id in seen
+        set_elapsed = time.perf_counter() - start
+
+        thread = CommentThread()
+        start = time.perf_counter()
+        for i, comment_id in enumerate(ids):
+            thread.add(comment_id)
+            thread.add(comment_id)
+            if i % 20 == 19:
+                thread.end_page()
+        thread_elapsed = time.perf_counter() - start
+        assert len(thread) == per_thread
+        print(f"{order}  set {set_elapsed:>7.3f}  CommentThread {thread_elapsed:>7.3f}")
+
+
+def main(total=1_000_000):
+    print(f"-- {total:,} 条评论，常驻内存（MB / 百万条评论）--")
+    for per_thread in (20, 200, 5000):
+        n_threads = total // per_thread
+        for label, job, finish in (
+            ('set + str (旧)', legacy_job, False),
+            ('CommentThread 全部在途', compact_job, False),
+            ('CommentThread 翻页结束释放', compact_job, True),
+        ):
+            current, peak = measure(job, n_threads, per_thread, finish)
+            scale = 1_000_000 / total / 2 ** 20
+            print(f"每楼 {per_thread:>5} 条  {label:<26} 常驻 {current * scale:>8.1f}  峰值 {peak * scale:>8.1f}")
+    time_inserts()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+parse_time 基准测试：对比 dateutil 通用解析与固定格式快速解析。
+在 weibospider 目录下运行：python -m benchmarks.bench_parse_time
+"""
+import random
+import time
+
+import dateutil.parser
+
+from spiders.common import parse_time, parse_times
+
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+
+def build_samples(n, distinct, seed=42):
+    """生成 n 条微博时间字符串，其中只有 distinct 条不同（模拟评论里重复出现的用户注册时间）"""
+    rnd = random.Random(seed)
+    pool = [
+        f"{rnd.choice(WEEKDAYS)} {rnd.choice(MONTHS)} {rnd.randint(1, 28):02d} "
+        f"{rnd.randint(0, 23):02d}:{rnd.randint(0, 59):02d}:{rnd.randint(0, 59):02d} +0800 "
+        f"{rnd.randint(2009, 2025)}"
+        for _ in range(distinct)
+    ]
+    return [rnd.choice(pool) for _ in range(n)]
+
+
+def run(label, func, samples):
+    start = time.perf_counter()
+    func(samples)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {len(samples) / elapsed:>14,.0f} 条/秒  ({elapsed * 1e6 / len(samples):.2f} us/条)")
+    return elapsed
+
+
+def main(n=200_000):
+    for distinct in (n, n // 20):
+        samples = build_samples(n, distinct)
+        # 结果需与 dateutil 完全一致
+        for s in samples[:1000]:
+            assert parse_time(s) == dateutil.parser.parse(s).strftime('%Y-%m-%d %H:%M:%S'), s
+        print(f"-- {n} 条，{distinct} 条不同 --")
+        parse_time.cache_clear()
+        base = run('dateutil.parser.parse', lambda xs: [dateutil.parser.parse(x).strftime('%Y-%m-%d %H:%M:%S') for x in xs], samples)
+        parse_time.cache_clear()
+        fast = run('parse_times (冷缓存)', parse_times, samples)
+        warm = run('parse_times (热缓存)', parse_times, samples)
+        print(f"加速比: 冷缓存 {base / fast:.1f}x, 热缓存 {base / warm:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+"""
+离线解析基准：基于 benchmarks/fixtures 下的接口响应样本，统计各解析函数的 items/s 与每条 item 的内存分配。
+样本可替换为 FullResponseDumpMiddleware 录制的真实响应（保持文件名与格式即可）。
+结果与 benchmarks/baseline_parsers.json 对比，吞吐下降或分配增加超过容差时以非 0 退出，便于上线前发现回退。
+在 weibospider 目录下运行：
+    python -m benchmarks.bench_parsers                   # 与基线对比
+    python -m benchmarks.bench_parsers --update-baseline # 重写基线
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from scrapy.http import HtmlResponse, Request
+
+from pipelines import JsonWriterPipeline
+from spiders.comment import CommentSpider
+from spiders.common import extract_longtext_from_mobile, parse_tweet_info, parse_user_info
+from spiders.tweet_by_keyword import TweetSpiderByKeyword
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_DIR = os.path.join(BENCH_DIR, 'fixtures')
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baseline_parsers.json')
+
+
+def load_json(name):
+    with open(os.path.join(FIXTURE_DIR, name), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_text(name):
+    with open(os.path.join(FIXTURE_DIR, name), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+class FakeSpider:
+    name = 'tweet_spider_by_tweet_id'
+    is_single = False
+    single_id = None
+    logger = logging.getLogger('bench')
+
+
+def build_cases():
+    """
+    返回 {名称: (单轮函数, 单轮产出 item 数)}；单轮函数返回产出的对象列表，
+    计分配时保留这些对象，与 spider 把 item 交给 pipeline 前的情况一致
+    """
+    show = load_json('statuses_show.json')
+    reposts = load_json('repostTimeline.json')['data']
+    friends = load_json('friendships_friends.json')['users']
+    profile = load_json('profile_info.json')['data']['user']
+    comments = load_json('buildComments.json')['data']
+    detail_html = load_text('m_weibo_detail.html')
+
+    search_spider = TweetSpiderByKeyword()
+    search_body = load_text('search.html').encode('utf-8')
+    search_request = Request('https://s.weibo.com/weibo?q=%E5%85%B3%E9%94%AE%E8%AF%8D&page=1', meta={'page': 1})
+
+    def search_page():
+        # 每轮新建响应，避免 response.text 的解码缓存让后续轮次变快；清空已请求微博，否则重复轮次全被去重
+        search_spider.requested_tweets.clear()
+        response = HtmlResponse(search_request.url, body=search_body, encoding='utf-8', request=search_request)
+        return [r for r in search_spider.parse(response) if r.callback == search_spider.parse_tweet]
+
+    pipeline = JsonWriterPipeline()
+    spider = FakeSpider()
+    pipeline.open_spider(spider)
+    tweet = parse_tweet_info(show)
+
+    def pipeline_items():
+        out = []
+        for _ in range(20):
+            out.append(pipeline.process_item(dict(tweet), spider))
+        return out
+
+    n_search = len(search_page())
+    return {
+        'parse_tweet_info/statuses_show': (lambda: [parse_tweet_info(show)], 1),
+        'parse_tweet_info/repostTimeline': (lambda: [parse_tweet_info(d) for d in reposts], len(reposts)),
+        'parse_user_info/friendships_friends': (lambda: [parse_user_info(u) for u in friends], len(friends)),
+        'parse_user_info/profile_info': (lambda: [parse_user_info(profile)], 1),
+        'CommentSpider.parse_comment/buildComments': (lambda: [CommentSpider.parse_comment(c) for c in comments], len(comments)),
+        'extract_longtext_from_mobile/m_weibo_detail': (lambda: [extract_longtext_from_mobile(detail_html)], 1),
+        'TweetSpiderByKeyword.parse/search': (search_page, n_search),
+        'JsonWriterPipeline.process_item': (pipeline_items, 20),
+    }, pipeline, spider
+
+
+def items_per_second(func, n_items, repeats=9, min_time=0.1):
+    """重复 repeats 次、每次至少 min_time 秒，取最好的一次以降低调度抖动的影响"""
+    func()
+    best = 0.0
+    for _ in range(repeats):
+        rounds, elapsed = 0, 0.0
+        start = time.perf_counter()
+        while elapsed < min_time:
+            func()
+            rounds += 1
+            elapsed = time.perf_counter() - start
+        best = max(best, rounds * n_items / elapsed)
+    return best
+
+
+def allocations_per_item(func, n_items, rounds=20):
+    """每条 item 新增的存活内存块数与字节数（tracemalloc 快照差，保留产出对象）"""
+    func()
+    keep = []
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for _ in range(rounds):
+        keep.append(func())
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = size = 0
+    for stat in after.compare_to(before, 'filename'):
+        if stat.count_diff > 0:
+            blocks += stat.count_diff
+            size += stat.size_diff
+    total = rounds * n_items
+    return blocks / total, size / total
+
+
+def run():
+    cases, pipeline, spider = build_cases()
+    results = {}
+    try:
+        for name, (func, n_items) in cases.items():
+            rate = items_per_second(func, n_items)
+            blocks, size = allocations_per_item(func, n_items)
+            results[name] = {
+                'items_per_s': round(rate, 1),
+                'allocs_per_item': round(blocks, 2),
+                'bytes_per_item': round(size, 1),
+            }
+    finally:
+        pipeline.close_spider(spider)
+    return results
+
+
+def compare(results, baseline, tolerance, alloc_tolerance):
+    regressions = []
+    print(f"{'case':<44} {'items/s':>12} {'基线':>12} {'变化':>8} {'allocs/item':>12} {'基线':>8}")
+    for name, res in results.items():
+        base = baseline.get(name)
+        if not base:
+            print(f"{name:<44} {res['items_per_s']:>12,.0f} {'-':>12} {'-':>8} {res['allocs_per_item']:>12.2f} {'-':>8}")
+            continue
+        change = res['items_per_s'] / base['items_per_s'] - 1
+        print(
+            f"{name:<44} {res['items_per_s']:>12,.0f} {base['items_per_s']:>12,.0f} {change:>+8.1%} "
+            f"{res['allocs_per_item']:>12.2f} {base['allocs_per_item']:>8.2f}"
+        )
+        if change < -tolerance:
+            regressions.append(f"{name}: items/s {change:+.1%}")
+        # 分配数与机器无关，放宽 1 个块以容忍解释器内部缓存的抖动
+        if res['allocs_per_item'] > base['allocs_per_item'] * (1 + alloc_tolerance) + 1:
+            regressions.append(f"{name}: allocs/item {base['allocs_per_item']} -> {res['allocs_per_item']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline parser benchmarks against recorded responses.')
+    parser.add_argument('--update-baseline', action='store_true', help='Write the current results as the new baseline')
+    # items/s 与机器相关，基线应在部署机器上生成；分配数与机器无关，容差更严
+    parser.add_argument('--tolerance', type=float, default=0.3,
+                        help='Allowed relative drop in items/s before failing')
+    parser.add_argument('--alloc-tolerance', type=float, default=0.1,
+                        help='Allowed relative rise in allocations per item before failing')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # JsonWriterPipeline 固定写到 ../output，切换到临时目录下的子目录运行
+        workdir = os.path.join(tmp, 'run')
+        os.makedirs(workdir)
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            results = run()
+        finally:
+            os.chdir(cwd)
+
+    if args.update_baseline:
+        with open(BASELINE_PATH, 'w', encoding='utf-8') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'cases': results,
+            }, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+        print(f"基线已写入 {BASELINE_PATH}")
+        for name, res in results.items():
+            print(f"{name:<44} {res['items_per_s']:>12,.0f} items/s {res['allocs_per_item']:>8.2f} allocs/item")
+        return
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, 'r', encoding='utf-8') as f:
+            baseline = json.load(f).get('cases', {})
+    regressions = compare(results, baseline, args.tolerance, args.alloc_tolerance)
+    if regressions:
+        print("\n性能回退：")
+        for line in regressions:
+            print(f"  - {line}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+extract_longtext_from_mobile 基准测试：对比旧的非贪婪正则 + 整体 json.loads 与括号平衡扫描。
+在 weibospider 目录下运行：python -m benchmarks.bench_render_data
+"""
+import json
+import random
+import re
+import time
+
+from spiders.common import extract_longtext_from_mobile
+
+
+def legacy_extract(html):
+    """旧实现：两次 re.DOTALL 非贪婪搜索，再解码整个 render 数组"""
+    patterns = [
+        r'\$render_data\s*=\s*(\[.*?\])\s*\[0\]',
+        r'\$render_data\s*=\s*(\[.*?\])\s*(?:;|\|\|)',
+    ]
+    render_json = None
+    for pat in patterns:
+        match = re.search(pat, html, re.DOTALL)
+        if match:
+            render_json = match.group(1)
+            break
+    if not render_json:
+        return None
+    try:
+        render_data = json.loads(render_json)
+    except Exception:
+        return None
+    for block in render_data if isinstance(render_data, list) else [render_data]:
+        if isinstance(block, dict) and 'status' in block:
+            long_text = block['status'].get('longText') or {}
+            return long_text.get('longTextContent') or block['status'].get('text_raw')
+    return None
+
+
+def build_page(n_comments, seed=7):
+    """构造接近真实大小的 m.weibo.cn/detail 页面：大量脚本、含 `]` 的文本与嵌套数组"""
+    rnd = random.Random(seed)
+    long_text = ''.join(rnd.choice('微博长文本[测试]内容，包含括号][与引号\\"。') for _ in range(4000))
+    status = {
+        'id': '4855130556270913',
+        'mblogid': 'Ll8aQ3HvX',
+        'text': long_text[:140],
+        'isLongText': True,
+        'longText': {'longTextContent': long_text, 'url_objects': [{'url': f'https://t.cn/{i}'} for i in range(50)]},
+        'pics': [{'pid': f'p{i}', 'large': {'geo': [i, i + 1]}} for i in range(9)],
+        'user': {'id': 1, 'screen_name': 'u]ser', 'badge': {str(i): i for i in range(40)}},
+    }
+    hot_comments = [
+        {'id': i, 'text': f'评论 [{i}] ]] 内容', 'users': [[i, i + 1], [i + 2]]}
+        for i in range(n_comments)
+    ]
+    render = [{'status': status, 'hotScheme': 'sinaweibo://', 'appScheme': [], 'comments': hot_comments}, {}]
+    head = '<script>var config = {"a": [1, 2, [3]]};</script>' * 200
+    tail = '<script>var list = [' + ','.join(f'[{i}]' for i in range(5000)) + '];</script>'
+    return (
+        f"<html><head>{head}</head><body><script>var $render_data = "
+        f"{json.dumps(render, ensure_ascii=False)}[0] || {{}};</script>{tail}</body></html>"
+    )
+
+
+def run(label, func, pages, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for page in pages:
+            func(page)
+    elapsed = time.perf_counter() - start
+    total = rounds * len(pages)
+    print(f"{label:<24} {total / elapsed:>10,.1f} 页/秒  ({elapsed * 1e3 / total:.3f} ms/页)")
+    return elapsed
+
+
+def main(rounds=20):
+    for n_comments in (20, 500, 2000):
+        pages = [build_page(n_comments, seed) for seed in range(5)]
+        for page in pages:
+            assert extract_longtext_from_mobile(page) == legacy_extract(page)
+        size_kb = sum(len(p) for p in pages) / len(pages) / 1024
+        print(f"-- {n_comments} 条内嵌评论，平均页面 {size_kb:.0f} KB --")
+        base = run('legacy regex + json.loads', legacy_extract, pages, rounds)
+        fast = run('bracket scanner', extract_longtext_from_mobile, pages, rounds)
+        print(f"加速比: {base / fast:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
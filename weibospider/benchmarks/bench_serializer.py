@@ -0,0 +1,82 @@
+"""
+JSONL 序列化基准测试：旧实现（复制 dict 调整字段顺序 + json.dumps）与可插拔后端对比。
+在 weibospider 目录下运行：python -m benchmarks.bench_serializer
+"""
+import json
+import time
+
+from pipelines import SERIALIZERS, orjson
+
+TWEET = {
+    '_id': '5056748957731967', 'mblogid': 'OnOizwrr9', 'created_at': '2024-06-01 12:30:45',
+    'geo': None, 'ip_location': '发布于 北京', 'reposts_count': 128, 'comments_count': 3021,
+    'attitudes_count': 18873, 'source': 'iPhone 15 Pro Max', 'content': '这是一条用于基准测试的微博正文，' * 12,
+    'pic_urls': [f'https://wx1.sinaimg.cn/orj960/pic{i}' for i in range(4)], 'pic_num': 4,
+    'isLongText': False, 'longTextExpanded': False, 'is_retweet': False,
+    'user': {
+        '_id': '3238235724', 'avatar_hd': 'https://tvax1.sinaimg.cn/crop.0.0.512.512.1024/abc.jpg',
+        'nick_name': '某个用户', 'verified': True, 'description': '个人简介' * 5, 'followers_count': 123456,
+        'friends_count': 321, 'statuses_count': 9876, 'gender': 'f', 'location': '北京 海淀区',
+        'mbrank': 6, 'mbtype': 12, 'verified_type': 0, 'verified_reason': '知名博主',
+    },
+    'url': 'https://weibo.com/3238235724/OnOizwrr9', 'reads_count': 100000,
+}
+COMMENT = {
+    '_id': 5056749987654321, 'created_at': '2024-06-01 12:31:02', 'like_counts': 42,
+    'ip_location': '来自上海', 'content': '回复评论内容～' * 4,
+    'comment_user': {
+        '_id': '1234567890', 'avatar_hd': 'https://tvax1.sinaimg.cn/avatar.jpg', 'nick_name': '评论者',
+        'verified': False, 'followers_count': 88, 'friends_count': 99, 'statuses_count': 11,
+        'gender': 'm', 'location': '上海', 'mbrank': 0, 'mbtype': 0,
+    },
+    'mblogin': 'OnOizwrr9',
+}
+
+
+def legacy_line(item, lead_key):
+    """旧实现：复制 dict 把 lead_key 放到最前，再用标准库序列化（含文本文件写入时的 UTF-8 编码）"""
+    item = {lead_key: item[lead_key], **{k: v for k, v in item.items() if k != lead_key}}
+    item['crawl_time'] = 1717216245
+    return (json.dumps(item, ensure_ascii=False) + "\n").encode('utf-8')
+
+
+def prepare(item, lead_key):
+    """与 JsonWriterPipeline.process_item 相同：补充 crawl_time 并把 lead_key 挪到末尾"""
+    item = dict(item)
+    item['crawl_time'] = 1717216245
+    item[lead_key] = item.pop(lead_key)
+    return item
+
+
+def run(label, func, items):
+    start = time.perf_counter()
+    for item, lead_key in items:
+        func(item, lead_key)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<18} {len(items) / elapsed:>12,.0f} 条/秒  ({elapsed * 1e6 / len(items):.2f} us/条)")
+    return elapsed
+
+
+def main(n=100_000):
+    for label, sample, lead_key in (('tweet', dict(TWEET, mblogin='OnOizwrr9'), 'mblogin'), ('comment', COMMENT, 'mblogin')):
+        legacy_items = [(dict(sample), lead_key) for _ in range(n)]
+        prepared = [(prepare(sample, lead_key), lead_key) for _ in range(n)]
+        expected = json.loads(legacy_line(dict(sample), lead_key))
+        print(f"-- {label} x {n} --")
+        base = run('legacy', legacy_line, legacy_items)
+        for name, cls in SERIALIZERS.items():
+            if name == 'orjson' and orjson is None:
+                print(f"{name:<18} 未安装，跳过")
+                continue
+            serializer = cls()
+            out = serializer.line(*prepared[0])
+            assert json.loads(out) == expected and next(iter(json.loads(out))) == lead_key
+            if name == 'json':
+                # 标准库后端输出需与旧实现逐字节一致
+                assert out == legacy_line(dict(sample), lead_key)
+            elapsed = run(name, serializer.line, prepared)
+            print(f"{'':<18} 相对旧实现 {base / elapsed:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+输出吞吐基准测试：JsonWriterPipeline（同步 / 缓冲）与 SqlitePipeline（首次写入 / 重复抓取 upsert）。
+在 weibospider 目录下运行：python -m benchmarks.bench_sqlite_sink
+"""
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+
+from benchmarks.bench_serializer import TWEET
+from pipelines import JsonWriterPipeline, SqlitePipeline
+
+
+class FakeSpider:
+    name = 'tweet_spider_by_keyword'
+    is_single = False
+    single_id = None
+    logger = logging.getLogger('bench')
+
+
+def build_items(n, round_no=0):
+    items = []
+    for i in range(n):
+        item = dict(TWEET)
+        item['_id'] = str(5056748957731967 + i)
+        item['attitudes_count'] = TWEET['attitudes_count'] + round_no
+        item['keyword'] = '基准'
+        items.append(item)
+    return items
+
+
+def run(label, pipeline, items):
+    spider = FakeSpider()
+    pipeline.open_spider(spider)
+    start = time.perf_counter()
+    for item in items:
+        pipeline.process_item(item, spider)
+    pipeline.close_spider(spider)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<26} {len(items) / elapsed:>12,.0f} 条/秒")
+    return elapsed
+
+
+def main(n=100_000):
+    with tempfile.TemporaryDirectory() as tmp:
+        # JsonWriterPipeline 固定写到 ../output，切换到临时目录下的子目录运行
+        workdir = os.path.join(tmp, 'run')
+        os.makedirs(workdir)
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            print(f"-- {n} 条微博 --")
+            run('jsonl (sync)', JsonWriterPipeline(), build_items(n))
+            run('jsonl (buffered)', JsonWriterPipeline(buffered=True), build_items(n))
+            db_path = os.path.join(tmp, 'bench.sqlite3')
+            run('sqlite (insert)', SqlitePipeline(path=db_path), build_items(n))
+            run('sqlite (upsert re-crawl)', SqlitePipeline(path=db_path), build_items(n, round_no=1))
+            with sqlite3.connect(db_path) as conn:
+                rows, = conn.execute(f'SELECT COUNT(*) FROM "{FakeSpider.name}"').fetchone()
+            assert rows == n, rows
+            print(f"重复抓取后表内仍为 {rows} 行")
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == '__main__':
+    main()
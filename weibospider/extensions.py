@@ -0,0 +1,241 @@
+import logging
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from urllib.parse import urlparse
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from twisted.internet import task
+from twisted.web.resource import Resource
+from twisted.web.server import Site
+
+logger = logging.getLogger(__name__)
+
+
+class Histogram:
+    """Prometheus 风格的累积直方图（le 桶 + sum + count）"""
+
+    def __init__(self, buckets):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, n in zip(self.buckets + ['+Inf'], self.counts):
+            cumulative += n
+            yield f'{name}_bucket{_labels(labels, le=bound)} {cumulative}'
+        yield f'{name}_sum{_labels(labels)} {self.total:.6f}'
+        yield f'{name}_count{_labels(labels)} {self.count}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _callback_name(request):
+    callback = request.callback if request is not None else None
+    return getattr(callback, '__name__', None) or 'parse'
+
+
+def _proxy_label(proxy_url):
+    """代理标签只保留 host:port，不暴露账号密码"""
+    parsed = urlparse(proxy_url)
+    return f'{parsed.hostname}:{parsed.port}'
+
+
+class MetricsResource(Resource):
+    isLeaf = True
+
+    def __init__(self, extension):
+        super().__init__()
+        self.extension = extension
+
+    def render_GET(self, request):
+        request.setHeader(b'Content-Type', b'text/plain; version=0.0.4; charset=utf-8')
+        return self.extension.render().encode('utf-8')
+
+
+class MetricsExtension:
+    """
+    在本地端口提供 Prometheus 文本格式的实时抓取指标（GET /metrics）：
+    - 每个 spider 的 item 总数与近 METRICS_RATE_INTERVAL 秒的 item/s，按回调拆分的 item 与响应数
+    - 按状态码的响应数，按账号 / 代理的下载延迟直方图
+    - AccountSessionMiddleware 中账号的 active / cooldown / dead 数量
+    - 调度器、下载器、scraper 的队列深度
+    需在 settings 中开启 METRICS_ENABLED，端口由 METRICS_PORT 指定
+    """
+
+    def __init__(self, crawler, host='127.0.0.1', port=9410, rate_interval=10.0, buckets=None):
+        self.crawler = crawler
+        self.host = host
+        self.port = port
+        self.rate_interval = rate_interval
+        self.buckets = buckets or [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+        self.listener = None
+        self.rate_task = None
+        self.spider_name = None
+        self.items = 0
+        self.items_per_second = 0.0
+        self._rate_mark = (0, time.time())
+        self.callback_items = defaultdict(int)
+        self.callback_responses = defaultdict(int)
+        self.status_counts = defaultdict(int)
+        self.account_latency = {}
+        self.proxy_latency = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('METRICS_ENABLED', False):
+            raise NotConfigured
+        ext = cls(
+            crawler,
+            host=settings.get('METRICS_HOST', '127.0.0.1'),
+            port=settings.getint('METRICS_PORT', 9410),
+            rate_interval=settings.getfloat('METRICS_RATE_INTERVAL', 10.0),
+            buckets=[float(b) for b in settings.getlist('METRICS_LATENCY_BUCKETS', [])] or None,
+        )
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(ext.item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(ext.response_received, signal=signals.response_received)
+        return ext
+
+    def spider_opened(self, spider):
+        from twisted.internet import reactor
+
+        self.spider_name = spider.name
+        try:
+            self.listener = reactor.listenTCP(self.port, Site(MetricsResource(self)), interface=self.host)
+        except Exception as exc:
+            spider.logger.warning(f"[metrics] 无法监听 {self.host}:{self.port}：{exc}")
+        else:
+            spider.logger.info(f"[metrics] 指标地址 http://{self.host}:{self.port}/metrics")
+        self._rate_mark = (self.items, time.time())
+        self.rate_task = task.LoopingCall(self._update_rate)
+        self.rate_task.start(self.rate_interval, now=False)
+
+    def spider_closed(self, spider):
+        if self.rate_task and self.rate_task.running:
+            self.rate_task.stop()
+        if self.listener:
+            self.listener.stopListening()
+            self.listener = None
+
+    def _update_rate(self):
+        items, ts = self._rate_mark
+        now = time.time()
+        if now > ts:
+            self.items_per_second = (self.items - items) / (now - ts)
+        self._rate_mark = (self.items, now)
+
+    def item_scraped(self, item, response, spider):
+        self.items += 1
+        self.callback_items[_callback_name(getattr(response, 'request', None))] += 1
+
+    def response_received(self, response, request, spider):
+        self.status_counts[response.status] += 1
+        self.callback_responses[_callback_name(request)] += 1
+        latency = request.meta.get('download_latency')
+        if latency is None:
+            return
+        account = request.meta.get('account')
+        if account:
+            hist = self.account_latency.get(account)
+            if hist is None:
+                hist = self.account_latency[account] = Histogram(self.buckets)
+            hist.observe(latency)
+        proxy = request.meta.get('bound_proxy')
+        if proxy:
+            label = _proxy_label(proxy)
+            hist = self.proxy_latency.get(label)
+            if hist is None:
+                hist = self.proxy_latency[label] = Histogram(self.buckets)
+            hist.observe(latency)
+
+    # ---- 输出 ----
+    def _account_pool(self):
+        engine = self.crawler.engine
+        manager = getattr(getattr(engine, 'downloader', None), 'middleware', None)
+        for mw in getattr(manager, 'middlewares', ()):
+            if hasattr(mw, 'pool'):
+                return mw.pool
+        return None
+
+    def _queue_depths(self):
+        engine = self.crawler.engine
+        depths = {}
+        scheduler = getattr(engine, 'scheduler', None)
+        if scheduler is None:
+            scheduler = getattr(getattr(engine, 'slot', None), 'scheduler', None)
+        if scheduler is not None and hasattr(scheduler, '__len__'):
+            depths['scheduler'] = len(scheduler)
+        downloader = getattr(engine, 'downloader', None)
+        if downloader is not None:
+            depths['downloader_active'] = len(downloader.active)
+            depths['downloader_queued'] = sum(len(slot.queue) for slot in downloader.slots.values())
+        scraper_slot = getattr(getattr(engine, 'scraper', None), 'slot', None)
+        if scraper_slot is not None:
+            depths['scraper_queued'] = len(scraper_slot.queue)
+            depths['scraper_active'] = len(scraper_slot.active)
+        return depths
+
+    def render(self):
+        spider = (('spider', self.spider_name),)
+        lines = [
+            '# TYPE weibo_items_scraped_total counter',
+            f'weibo_items_scraped_total{_labels(spider)} {self.items}',
+            '# TYPE weibo_items_per_second gauge',
+            f'weibo_items_per_second{_labels(spider)} {self.items_per_second:.3f}',
+            '# TYPE weibo_callback_items_total counter',
+        ]
+        for callback, n in sorted(self.callback_items.items()):
+            lines.append(f'weibo_callback_items_total{_labels(spider, callback=callback)} {n}')
+        lines.append('# TYPE weibo_callback_responses_total counter')
+        for callback, n in sorted(self.callback_responses.items()):
+            lines.append(f'weibo_callback_responses_total{_labels(spider, callback=callback)} {n}')
+        lines.append('# TYPE weibo_responses_total counter')
+        for status, n in sorted(self.status_counts.items()):
+            lines.append(f'weibo_responses_total{_labels(spider, status=status)} {n}')
+
+        lines.append('# TYPE weibo_account_latency_seconds histogram')
+        for account, hist in sorted(self.account_latency.items()):
+            lines.extend(hist.lines('weibo_account_latency_seconds', (('account', account),)))
+        lines.append('# TYPE weibo_proxy_latency_seconds histogram')
+        for proxy, hist in sorted(self.proxy_latency.items()):
+            lines.extend(hist.lines('weibo_proxy_latency_seconds', (('proxy', proxy),)))
+
+        pool = self._account_pool()
+        if pool is not None:
+            states = defaultdict(int)
+            for acc in pool:
+                # 冷却到期但尚未被取号的账号也按 active 计
+                status = 'active' if acc.status == 'cooldown' and time.time() >= acc.cooldown_until else acc.status
+                states[status] += 1
+            lines.append('# TYPE weibo_accounts gauge')
+            for status in ('active', 'cooldown', 'dead'):
+                lines.append(f'weibo_accounts{_labels((), status=status)} {states[status]}')
+            lines.append('# TYPE weibo_account_rate gauge')
+            for acc in pool:
+                if acc.rate is not None:
+                    lines.append(f'weibo_account_rate{_labels((), account=acc.account)} {acc.rate:.3f}')
+
+        lines.append('# TYPE weibo_queue_depth gauge')
+        for queue, depth in self._queue_depths().items():
+            lines.append(f'weibo_queue_depth{_labels((), queue=queue)} {depth}')
+        return '\n'.join(lines) + '\n'
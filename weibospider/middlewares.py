@@ -3,12 +3,26 @@ import json
 import os
 import time
 import datetime
+import heapq
+import math
 import pathlib
+import random
 import re
-from itertools import cycle
+import sqlite3
+import sys
+import threading
+import urllib.request
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional
 from urllib.parse import urlparse
 from scrapy import signals
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.http import Headers, TextResponse
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.defer import maybe_deferred_to_future
+from twisted.internet import task
+from w3lib.url import canonicalize_url
 
 class AccountState:
     def __init__(self, account: str, cookie: str):
@@ -21,6 +35,19 @@ class AccountState:
         self.assigned_proxy = None
         self.proxy_assigned_at = 0
         self.xsrf_token = self._extract_xsrf(cookie)
+        # 近期成功率（EWMA），用于账号池加权轮询
+        self.success_rate = 1.0
+        # 请求计数，由 AccountSessionMiddleware 定期写入事件流
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.latency_total = 0.0
+        self.latency_samples = 0
+        # AccountRateLimiter 维护的当前速率（请求/秒），未启用限速时为 None
+        self.rate = None
+        # AccountPool 内部状态：下一轮次、堆条目版本号
+        self.pool_turn = 0.0
+        self.pool_version = 0
 
     def is_available(self) -> bool:
         if self.status == 'dead':
@@ -34,6 +61,7 @@ class AccountState:
         return self.status == 'active'
 
     def mark_failure(self, spider_logger):
+        self.success_rate *= 0.9
         self.fail_streak += 1
         if self.fail_streak > 10:
             self.cooldown_times += 1
@@ -49,6 +77,7 @@ class AccountState:
                 )
 
     def mark_success(self):
+        self.success_rate = self.success_rate * 0.9 + 0.1
         self.fail_streak = 0
 
     @staticmethod
@@ -60,7 +89,180 @@ class AccountState:
         return None
 
 
+class AccountPool:
+    """
+    账号池：dict 按账号名索引，两个最小堆维护可用性，取号 O(log n)。
+    - cooling：冷却中的账号，按冷却结束时间排序，到期后移入 ready
+    - ready：可用账号，按轮次排序加权轮询；每次取用后轮次推进 1 / (成功率 × 当前速率)，
+      成功率低或被限速的账号轮得更慢，避免请求堆积在慢账号的下载槽里
+    - 下线账号不在任何堆中；堆条目带版本号，账号状态变化时重新入堆，旧条目出堆时丢弃
+    """
+
+    min_success_rate = 0.05
+
+    def __init__(self, accounts: List[AccountState]):
+        self.by_name: Dict[str, AccountState] = {}
+        self.ready = []
+        self.cooling = []
+        self.seq = 0
+        self.clock = 0.0
+        for acc in accounts:
+            self.by_name[acc.account] = acc
+            self._push(acc)
+
+    def __len__(self):
+        return len(self.by_name)
+
+    def __iter__(self):
+        return iter(self.by_name.values())
+
+    def get(self, account: Optional[str]) -> Optional[AccountState]:
+        return self.by_name.get(account)
+
+    def _push(self, acc: AccountState):
+        acc.pool_version += 1
+        self.seq += 1
+        if acc.status == 'cooldown':
+            heapq.heappush(self.cooling, (acc.cooldown_until, self.seq, acc.pool_version, acc))
+        elif acc.status != 'dead':
+            heapq.heappush(self.ready, (acc.pool_turn, self.seq, acc.pool_version, acc))
+
+    def _release_cooled(self, now: float):
+        cooling = self.cooling
+        while cooling and cooling[0][0] <= now:
+            _, _, version, acc = heapq.heappop(cooling)
+            if version != acc.pool_version:
+                continue
+            if not acc.is_available():
+                # 冷却时间被延长等情况：按新的结束时间重新入堆
+                self._push(acc)
+                continue
+            # 冷却前的轮次已落后，从当前轮次重新排队，避免恢复后集中取用
+            acc.pool_turn = max(acc.pool_turn, self.clock)
+            self._push(acc)
+
+    def pick(self, now: Optional[float] = None) -> Optional[AccountState]:
+        self._release_cooled(time.time() if now is None else now)
+        ready = self.ready
+        while ready:
+            turn, _, version, acc = heapq.heappop(ready)
+            if version != acc.pool_version:
+                continue
+            self.clock = max(self.clock, turn)
+            acc.pool_turn = self.clock + 1 / (max(acc.success_rate, self.min_success_rate) * (acc.rate or 1.0))
+            self._push(acc)
+            return acc
+        return None
+
+    def mark_failure(self, acc: AccountState, spider_logger) -> bool:
+        """返回账号状态是否变化（进入冷却 / 下线）"""
+        status = acc.status
+        acc.mark_failure(spider_logger)
+        if acc.status == status:
+            return False
+        self._push(acc)
+        return True
+
+    def mark_success(self, acc: AccountState):
+        acc.mark_success()
+
+
+class AccountRateLimiter:
+    """
+    账号级 AIMD 限速。每个账号一个容量为 1 的令牌桶，落到下载槽上即请求间隔 delay = 1 / rate：
+    - 正常响应：rate += increase / rate，约每秒加 increase（请求/秒）
+    - 418/429/403 或反爬 HTML：rate *= decrease
+    速率限制在 [min_rate, max_rate]，当前值写入 stats 的 account_rate/<账号>
+    """
+
+    def __init__(self, start_rate=1.0, min_rate=0.1, max_rate=5.0, increase=0.05, decrease=0.5,
+                 throttle_codes=(418, 429, 403), block_markers=(), stats=None):
+        self.start_rate = start_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.throttle_codes = set(throttle_codes)
+        self.block_markers = [m.encode('utf-8') for m in block_markers]
+        self.stats = stats
+
+    @classmethod
+    def from_settings(cls, settings, stats=None):
+        delay = settings.getfloat('DOWNLOAD_DELAY', 0)
+        return cls(
+            start_rate=settings.getfloat('ACCOUNT_RATE_START', 1 / delay if delay else 1.0),
+            min_rate=settings.getfloat('ACCOUNT_RATE_MIN', 0.1),
+            max_rate=settings.getfloat('ACCOUNT_RATE_MAX', 5.0),
+            increase=settings.getfloat('ACCOUNT_RATE_INCREASE', 0.05),
+            decrease=settings.getfloat('ACCOUNT_RATE_DECREASE', 0.5),
+            throttle_codes=[int(c) for c in settings.getlist('ACCOUNT_RATE_THROTTLE_CODES', [418, 429, 403])],
+            block_markers=settings.getlist('ACCOUNT_RATE_BLOCK_MARKERS', []),
+            stats=stats,
+        )
+
+    def rate_of(self, acc: AccountState) -> float:
+        if acc.rate is None:
+            acc.rate = self.start_rate
+        return acc.rate
+
+    def is_throttled(self, response) -> bool:
+        if response.status in self.throttle_codes:
+            return True
+        if not self.block_markers:
+            return False
+        # ajax 接口正常返回 JSON；返回 HTML 时再检查是否为访客验证 / 频控页面
+        head = response.body[:4096]
+        if not head.lstrip()[:1] == b'<':
+            return False
+        return any(marker in head for marker in self.block_markers)
+
+    def on_response(self, acc: AccountState, throttled: bool) -> float:
+        rate = self.rate_of(acc)
+        if throttled:
+            rate = max(self.min_rate, rate * self.decrease)
+            if self.stats is not None:
+                self.stats.inc_value('account_rate/decrease')
+        else:
+            rate = min(self.max_rate, rate + self.increase / rate)
+        acc.rate = rate
+        if self.stats is not None:
+            self.stats.set_value(f'account_rate/{acc.account}', round(rate, 3))
+        return rate
+
+
+class ProxyEndpoint:
+    """单个代理出口：延迟与错误率的 EWMA，以及当前绑定的账号数"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.assigned = 0
+        self.samples = 0
+
+    def record(self, ok: bool, latency: Optional[float], alpha: float):
+        self.samples += 1
+        self.error_rate += alpha * ((0.0 if ok else 1.0) - self.error_rate)
+        if ok and latency is not None:
+            self.latency = latency if self.latency is None else self.latency + alpha * (latency - self.latency)
+
+    def score(self) -> float:
+        """每次成功请求的期望耗时（秒），越小越健康；未测过延迟的出口按 1 秒估计"""
+        latency = 1.0 if self.latency is None else self.latency
+        return latency / max(1.0 - self.error_rate, 0.05)
+
+
 class ProxyConfig:
+    """
+    代理池配置。proxy_config.json 兼容两种写法：
+    - 单个出口：顶层 scheme/host/port/username/password
+    - 多个出口：proxies 列表，每项写 host/port，未写的 scheme/username/password 继承顶层
+    可选 health_check_url：后台线程每 health_check_interval_seconds 经各出口探测一次，更新延迟 / 错误率 EWMA
+    """
+
+    # 视为出口问题的响应码（代理鉴权失败、出口被限流或网关错误）
+    error_statuses = {407, 418, 429, 502, 503, 504}
+
     def __init__(self, config: Dict):
         self.scheme = config.get('scheme', 'http')
         self.host = config.get('host')
@@ -68,22 +270,138 @@ class ProxyConfig:
         self.username = config.get('username')
         self.password = config.get('password')
         self.rotate_interval = int(config.get('rotate_interval_seconds', 1800))
+        self.health_check_url = config.get('health_check_url')
+        self.health_check_interval = float(config.get('health_check_interval_seconds', 60))
+        self.health_check_timeout = float(config.get('health_check_timeout_seconds', 10))
+        self.ewma_alpha = float(config.get('ewma_alpha', 0.3))
+        # 错误率超过该值的出口视为不可用，已绑定的账号在 unhealthy_rotate_seconds 后提前换出口
+        self.max_error_rate = float(config.get('max_error_rate', 0.5))
+        self.unhealthy_rotate_interval = float(config.get('unhealthy_rotate_seconds', 60))
+        entries = [dict(config, **entry) for entry in config.get('proxies') or []] or [config]
+        self.endpoints: Dict[str, ProxyEndpoint] = {}
+        for entry in entries:
+            url = self._build_url(entry)
+            if url and url not in self.endpoints:
+                self.endpoints[url] = ProxyEndpoint(url)
+        self.lock = threading.Lock()
+        self._stop_probes = threading.Event()
+        self._probe_thread = None
 
-    def build_proxy(self) -> Optional[str]:
-        if not self.host or not self.port:
+    @staticmethod
+    def _build_url(entry: Dict) -> Optional[str]:
+        scheme = entry.get('scheme', 'http')
+        host, port = entry.get('host'), entry.get('port')
+        if not host or not port:
             return None
-        if self.username and self.password:
-            return f"{self.scheme}://{self.username}:{self.password}@{self.host}:{self.port}"
-        return f"{self.scheme}://{self.host}:{self.port}"
+        if entry.get('username') and entry.get('password'):
+            return f"{scheme}://{entry['username']}:{entry['password']}@{host}:{port}"
+        return f"{scheme}://{host}:{port}"
+
+    def build_proxy(self) -> Optional[str]:
+        return next(iter(self.endpoints), None)
+
+    def is_healthy(self, url: Optional[str]) -> bool:
+        endpoint = self.endpoints.get(url)
+        return endpoint is not None and endpoint.error_rate < self.max_error_rate
+
+    def acquire(self, previous: Optional[str] = None) -> Optional[str]:
+        """释放账号原出口，优先在可用出口中分配最健康的空闲出口；没有空闲出口时选绑定账号最少的"""
+        with self.lock:
+            if previous in self.endpoints:
+                self.endpoints[previous].assigned = max(0, self.endpoints[previous].assigned - 1)
+            if not self.endpoints:
+                return None
+            best = min(
+                self.endpoints.values(),
+                key=lambda e: (e.error_rate >= self.max_error_rate, e.assigned, e.score()),
+            )
+            best.assigned += 1
+            return best.url
+
+    def record(self, url: Optional[str], ok: bool, latency: Optional[float] = None):
+        endpoint = self.endpoints.get(url)
+        if endpoint is None:
+            return
+        with self.lock:
+            endpoint.record(ok, latency, self.ewma_alpha)
+
+    # ---- 后台健康探测 ----
+    def start_probes(self, logger):
+        if not self.health_check_url or self._probe_thread:
+            return
+        self._stop_probes.clear()
+        self._probe_thread = threading.Thread(target=self._probe_loop, args=(logger,), name='proxy-health', daemon=True)
+        self._probe_thread.start()
+
+    def stop_probes(self):
+        self._stop_probes.set()
+        self._probe_thread = None
+
+    def _probe(self, url: str):
+        opener = urllib.request.build_opener(urllib.request.ProxyHandler({'http': url, 'https': url}))
+        start = time.time()
+        try:
+            with opener.open(self.health_check_url, timeout=self.health_check_timeout) as resp:
+                resp.read(1024)
+                ok = resp.status < 400
+        except Exception:
+            ok = False
+        self.record(url, ok, time.time() - start)
+
+    def _probe_loop(self, logger):
+        with ThreadPoolExecutor(max_workers=min(8, len(self.endpoints) or 1)) as executor:
+            while not self._stop_probes.is_set():
+                list(executor.map(self._probe, list(self.endpoints)))
+                logger.debug(f"[ProxyPool] 健康探测完成 {self.summary()}")
+                self._stop_probes.wait(self.health_check_interval)
+
+    def summary(self) -> str:
+        parts = []
+        for endpoint in self.endpoints.values():
+            parsed = urlparse(endpoint.url)
+            latency = '-' if endpoint.latency is None else f"{endpoint.latency:.2f}s"
+            parts.append(
+                f"{parsed.hostname}:{parsed.port}"
+                f"(latency={latency}, error={endpoint.error_rate:.2f}, accounts={endpoint.assigned})"
+            )
+        return ', '.join(parts)
+
+
+class EventLog:
+    """
+    缓冲的 JSON lines 事件流：事件先进内存，满 max_buffer 条或调用 flush 时一次性追加写盘，
+    避免封号潮时在 reactor 线程上频繁开关文件
+    """
+
+    def __init__(self, path: str, max_buffer: int = 1000):
+        self.path = path
+        self.max_buffer = max_buffer
+        self.buffer: List[str] = []
+
+    def emit(self, event: str, **fields):
+        record = {'ts': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'event': event}
+        record.update(fields)
+        self.buffer.append(json.dumps(record, ensure_ascii=False))
+        if len(self.buffer) >= self.max_buffer:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        lines, self.buffer = self.buffer, []
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
 
 
 class AccountSessionMiddleware:
     """
     负责：
-    - 轮询 Cookie 池并绑定代理
-    - 按账号绑定代理，超过 rotate_interval_seconds 重新分配
+    - 从 Cookie 池（AccountPool）按成功率加权轮询取号并绑定代理
+    - 按账号绑定代理，超过 rotate_interval_seconds 或出口错误率过高时，重新分配最健康的空闲出口
     - 401/403 失败策略：>10 连续 -> 冷却 5 分钟，重复 3 轮后永久下线
-    - 记录日志：冷却事件、代理分配、请求计数
+    - 可选账号级 AIMD 限速（AccountRateLimiter），调整账号所在下载槽的 delay
+    - 事件流 logs/events.jsonl：冷却事件、代理分配，以及每 ACCOUNT_EVENT_LOG_INTERVAL 秒一次的
+      账号请求 / 成功 / 失败 / 延迟计数
     """
 
     cookies_path = os.path.join(os.path.dirname(__file__), 'cookies.json')
@@ -91,11 +409,18 @@ class AccountSessionMiddleware:
 
     def __init__(self):
         self.accounts: List[AccountState] = []
-        self.account_iter = None
+        self.pool = AccountPool([])
         self.proxy_config: Optional[ProxyConfig] = None
-        self.account_request_count: Dict[str, int] = {}
+        self.rate_limiter: Optional[AccountRateLimiter] = None
+        self.crawler = None
         self.log_dir = os.path.join(os.path.dirname(__file__), 'logs')
         os.makedirs(self.log_dir, exist_ok=True)
+        self.events = EventLog(os.path.join(self.log_dir, 'events.jsonl'))
+        self.counter_interval = 60.0
+        self.counter_task = None
+        self.probe_enabled = True
+        # 上次写出计数时各账号的累计值，用于计算区间增量
+        self.last_counters: Dict[str, tuple] = {}
         self._atexit_registered = False
         self._register_atexit()
         self._load_cookies()
@@ -104,6 +429,14 @@ class AccountSessionMiddleware:
     @classmethod
     def from_crawler(cls, crawler):
         mw = cls()
+        mw.crawler = crawler
+        if crawler.settings.getbool('ACCOUNT_RATE_LIMIT_ENABLED', False):
+            mw.rate_limiter = AccountRateLimiter.from_settings(crawler.settings, crawler.stats)
+        # 回放模式完全离线，不做代理健康探测
+        mw.probe_enabled = not crawler.settings.getbool('REPLAY_ENABLED', False)
+        mw.counter_interval = crawler.settings.getfloat('ACCOUNT_EVENT_LOG_INTERVAL', 60)
+        mw.events.max_buffer = crawler.settings.getint('ACCOUNT_EVENT_LOG_BUFFER', 1000)
+        crawler.signals.connect(mw.spider_opened, signal=signals.spider_opened)
         crawler.signals.connect(mw.spider_closed, signal=signals.spider_closed)
         # 捕获引擎停止（例如 Ctrl+C），尽量落盘统计
         crawler.signals.connect(mw.engine_stopped, signal=signals.engine_stopped)
@@ -121,9 +454,7 @@ class AccountSessionMiddleware:
             return
         self.accounts = [AccountState(item.get('account', f'acct_{idx}'), item.get('cookie', ''))
                          for idx, item in enumerate(data) if item.get('cookie')]
-        self.account_iter = cycle(self.accounts) if self.accounts else None
-        for acc in self.accounts:
-            self.account_request_count[acc.account] = 0
+        self.pool = AccountPool(self.accounts)
 
     def _load_proxy_config(self):
         if not os.path.exists(self.proxy_config_path):
@@ -137,12 +468,11 @@ class AccountSessionMiddleware:
             self.proxy_config = None
 
     def _pick_account(self, spider):
-        if not self.account_iter:
+        if not self.pool:
             return None
-        for _ in range(len(self.accounts)):
-            acc = next(self.account_iter)
-            if acc.is_available():
-                return acc
+        acc = self.pool.pick()
+        if acc:
+            return acc
         spider.logger.warning("[CookiePool] 没有可用账号，全部处于冷却或下线状态")
         return None
 
@@ -150,13 +480,17 @@ class AccountSessionMiddleware:
         if not self.proxy_config:
             return None
         now = time.time()
-        if acc.assigned_proxy and now - acc.proxy_assigned_at < self.proxy_config.rotate_interval:
+        held = now - acc.proxy_assigned_at
+        if acc.assigned_proxy and held < self.proxy_config.rotate_interval and (
+                held < self.proxy_config.unhealthy_rotate_interval or self.proxy_config.is_healthy(acc.assigned_proxy)):
             return acc.assigned_proxy
-        proxy_url = self.proxy_config.build_proxy()
+        previous = acc.assigned_proxy
+        proxy_url = self.proxy_config.acquire(previous=previous)
         acc.assigned_proxy = proxy_url
         acc.proxy_assigned_at = now
         # 记录代理分配
-        self._log_proxy_assignment(acc.account, proxy_url)
+        if proxy_url != previous:
+            self._log_proxy_assignment(acc.account, proxy_url)
         return proxy_url
 
     def process_request(self, request, spider):
@@ -166,7 +500,7 @@ class AccountSessionMiddleware:
         # 绑定 Cookie
         request.headers['Cookie'] = acc.cookie
         request.meta['account'] = acc.account
-        self.account_request_count[acc.account] = self.account_request_count.get(acc.account, 0) + 1
+        acc.requests += 1
 
         # 如果有 XSRF token，则附加到请求头
         if acc.xsrf_token:
@@ -184,73 +518,119 @@ class AccountSessionMiddleware:
         else:
             # 无代理时，按账号区分下载槽，避免多账号共用一槽
             request.meta['download_slot'] = acc.account
+        if self.rate_limiter:
+            self._apply_rate(request.meta['download_slot'], self.rate_limiter.rate_of(acc))
+
+    def _apply_rate(self, slot_key: str, rate: float):
+        """账号速率落到下载槽：槽在首个请求入队时才创建，之后每次变化直接改 delay"""
+        engine = getattr(self.crawler, 'engine', None)
+        slot = engine.downloader.slots.get(slot_key) if engine else None
+        if slot is not None:
+            slot.delay = 1 / rate
 
     def process_response(self, request, response, spider):
-        account_name = request.meta.get('account')
-        acc = next((a for a in self.accounts if a.account == account_name), None)
+        if self.proxy_config and request.meta.get('bound_proxy'):
+            self.proxy_config.record(
+                request.meta['bound_proxy'],
+                response.status not in self.proxy_config.error_statuses,
+                request.meta.get('download_latency'),
+            )
+        acc = self.pool.get(request.meta.get('account'))
+        if acc and self.rate_limiter:
+            rate = self.rate_limiter.on_response(acc, self.rate_limiter.is_throttled(response))
+            self._apply_rate(request.meta.get('download_slot'), rate)
         if acc and response.status in (401, 403):
-            acc.mark_failure(spider.logger)
-            self._log_cooldown_event(acc)
+            acc.failures += 1
+            if self.pool.mark_failure(acc, spider.logger):
+                self._log_cooldown_event(acc)
         elif acc:
-            acc.mark_success()
+            acc.successes += 1
+            latency = request.meta.get('download_latency')
+            if latency is not None:
+                acc.latency_total += latency
+                acc.latency_samples += 1
+            self.pool.mark_success(acc)
         return response
 
     def process_exception(self, request, exception, spider):
         # 网络异常时记录并允许 Scrapy 重试
-        account_name = request.meta.get('account')
-        acc = next((a for a in self.accounts if a.account == account_name), None)
+        if self.proxy_config and request.meta.get('bound_proxy'):
+            self.proxy_config.record(request.meta['bound_proxy'], False)
+        acc = self.pool.get(request.meta.get('account'))
         if acc:
-            acc.mark_failure(spider.logger)
+            acc.failures += 1
+            if self.pool.mark_failure(acc, spider.logger):
+                self._log_cooldown_event(acc)
             spider.logger.debug(f"[CookiePool] 账号 {acc.account} 出现异常 {exception}")
         return None
 
+    def spider_opened(self, spider):
+        if self.proxy_config and self.probe_enabled:
+            self.proxy_config.start_probes(spider.logger)
+        if self.counter_interval > 0:
+            self.counter_task = task.LoopingCall(self._flush_request_counts, reason="interval")
+            self.counter_task.start(self.counter_interval, now=False)
+
+    def _stop_counter_task(self):
+        if self.counter_task and self.counter_task.running:
+            self.counter_task.stop()
+        self.counter_task = None
+
     def spider_closed(self, spider):
+        if self.proxy_config:
+            self.proxy_config.stop_probes()
+            spider.logger.info(f"[ProxyPool] {self.proxy_config.summary()}")
+        self._stop_counter_task()
         self._flush_request_counts(reason="spider_closed")
 
     def engine_stopped(self):
         # spider 参数不可用时也尝试落盘
+        if self.proxy_config:
+            self.proxy_config.stop_probes()
+        self._stop_counter_task()
         self._flush_request_counts(reason="engine_stopped")
 
     # ---- logging helpers ----
-    def _append_log(self, filename: str, content: str):
-        path = os.path.join(self.log_dir, filename)
-        with open(path, 'a', encoding='utf-8') as f:
-            f.write(content)
-
-    @staticmethod
-    def _now():
-        return datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-
     def _log_cooldown_event(self, acc: AccountState):
-        # 只在进入冷却或死亡时写入；在 mark_failure 中状态已更新
-        status = acc.status
-        if status in ('cooldown', 'dead'):
-            ts = self._now()
-            line = (
-                f"{ts}\taccount={acc.account}\tstatus={status}\t"
-                f"cooldown_times={acc.cooldown_times}\tfail_streak={acc.fail_streak}"
+        # 只在进入冷却或下线时写入；状态已在 mark_failure 中更新
+        if acc.status in ('cooldown', 'dead'):
+            self.events.emit(
+                'cooldown',
+                account=acc.account,
+                status=acc.status,
+                cooldown_times=acc.cooldown_times,
+                fail_streak=acc.fail_streak,
             )
-            self._append_log('cooldown.log', line + '\n')
 
     def _log_proxy_assignment(self, account: str, proxy_url: Optional[str]):
         if not proxy_url:
             return
-        ts = self._now()
-        line = f"{ts}\taccount={account}\tproxy={proxy_url}"
-        self._append_log('proxy_assignment.log', line + '\n')
+        self.events.emit('proxy_assignment', account=account, proxy=proxy_url)
 
     def _flush_request_counts(self, reason: str = ""):
-        if not self.account_request_count:
-            return
-        ts = self._now()
-        lines = []
-        for account, cnt in sorted(self.account_request_count.items()):
-            if reason:
-                lines.append(f"{ts}\taccount={account}\trequest_count={cnt}\treason={reason}")
-            else:
-                lines.append(f"{ts}\taccount={account}\trequest_count={cnt}")
-        if lines:
-            self._append_log('request_counts.log', '\n'.join(lines) + '\n')
+        """写出各账号累计计数与本区间增量，并把缓冲的事件一起落盘"""
+        for acc in self.pool:
+            current = (acc.requests, acc.successes, acc.failures, acc.latency_total, acc.latency_samples)
+            last = self.last_counters.get(acc.account, (0, 0, 0, 0.0, 0))
+            if current == last and reason == "interval":
+                continue
+            self.last_counters[acc.account] = current
+            samples = current[4] - last[4]
+            self.events.emit(
+                'account_counters',
+                account=acc.account,
+                reason=reason,
+                status=acc.status,
+                requests=acc.requests,
+                successes=acc.successes,
+                failures=acc.failures,
+                interval_requests=current[0] - last[0],
+                interval_successes=current[1] - last[1],
+                interval_failures=current[2] - last[2],
+                latency_avg=round((current[3] - last[3]) / samples, 4) if samples else None,
+                rate=None if acc.rate is None else round(acc.rate, 3),
+            )
+        self.events.flush()
 
     def _register_atexit(self):
         if self._atexit_registered:
@@ -266,14 +646,166 @@ class AccountSessionMiddleware:
         self._atexit_registered = True
 
 
+class TTLResponseCacheMiddleware:
+    """
+    幂等 ajax 接口的本地 TTL 缓存（statuses/show、profile/info、profile/detail 等）。
+    - 键为规范化后的 URL（query 参数排序），每个接口路径单独配置 TTL
+    - 响应体 zlib 压缩后存入本地 SQLite；总大小超过上限时按最近访问时间做 LRU 淘汰
+    - 需排在 AccountSessionMiddleware 之前：命中时直接返回缓存响应，不占用账号、代理与下载槽
+    - 命中率写入 stats：ttl_cache/hit、ttl_cache/miss、ttl_cache/store、ttl_cache/evicted
+    """
+
+    default_ttls = {
+        '/ajax/statuses/show': 3600,
+        '/ajax/profile/info': 86400,
+        '/ajax/profile/detail': 7 * 86400,
+    }
+
+    def __init__(self, path, ttls=None, max_bytes=512 * 1024 * 1024, stats=None):
+        self.ttls = dict(ttls or self.default_ttls)
+        self.max_bytes = int(max_bytes)
+        self.stats = stats
+        cache_dir = os.path.dirname(path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        with self.conn:
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                'key TEXT PRIMARY KEY, url TEXT, status INTEGER, content_type TEXT, '
+                'body BLOB, size INTEGER, stored_at REAL, last_access REAL)'
+            )
+            self.conn.execute('CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)')
+        self.total_bytes = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('HTTP_TTL_CACHE_ENABLED', False):
+            raise NotConfigured
+        mw = cls(
+            path=settings.get('HTTP_TTL_CACHE_PATH', '../output/http_cache/responses.sqlite3'),
+            ttls=settings.getdict('HTTP_TTL_CACHE_ENDPOINTS') or None,
+            max_bytes=settings.getint('HTTP_TTL_CACHE_MAX_BYTES', 512 * 1024 * 1024),
+            stats=crawler.stats,
+        )
+        crawler.signals.connect(mw.spider_closed, signal=signals.spider_closed)
+        return mw
+
+    def _ttl_for(self, request):
+        if request.method != 'GET' or request.meta.get('dont_cache'):
+            return None
+        return self.ttls.get(urlparse(request.url).path)
+
+    @staticmethod
+    def _cache_key(url):
+        return canonicalize_url(url)
+
+    def _inc(self, key, count=1):
+        if self.stats:
+            self.stats.inc_value(key, count)
+
+    def process_request(self, request, spider):
+        ttl = self._ttl_for(request)
+        if ttl is None:
+            return None
+        key = self._cache_key(request.url)
+        row = self.conn.execute(
+            'SELECT status, content_type, body, stored_at FROM responses WHERE key = ?', (key,)
+        ).fetchone()
+        now = time.time()
+        if not row or now - row[3] > ttl:
+            self.misses += 1
+            self._inc('ttl_cache/miss')
+            return None
+        status, content_type, body, _ = row
+        with self.conn:
+            self.conn.execute('UPDATE responses SET last_access = ? WHERE key = ?', (now, key))
+        self.hits += 1
+        self._inc('ttl_cache/hit')
+        body = zlib.decompress(body)
+        headers = Headers({'Content-Type': content_type} if content_type else {})
+        respcls = responsetypes.from_args(headers=headers, url=request.url, body=body)
+        return respcls(url=request.url, status=status, headers=headers, body=body,
+                       flags=['ttl_cached'], request=request)
+
+    def process_response(self, request, response, spider):
+        # 缓存命中与离线回放的响应都不是新抓取的，不写回缓存
+        if 'ttl_cached' in response.flags or 'replay' in response.flags or response.status != 200:
+            return response
+        if self._ttl_for(request) is None or not self._is_cacheable(response.body):
+            return response
+        body = zlib.compress(response.body, 6)
+        content_type = response.headers.get('Content-Type', b'').decode('latin-1') or None
+        now = time.time()
+        key = self._cache_key(request.url)
+        with self.conn:
+            old = self.conn.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            self.conn.execute(
+                'INSERT OR REPLACE INTO responses '
+                '(key, url, status, content_type, body, size, stored_at, last_access) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, request.url, response.status, content_type, body, len(body), now, now),
+            )
+        self.total_bytes += len(body) - (old[0] if old else 0)
+        self._inc('ttl_cache/store')
+        if self.total_bytes > self.max_bytes:
+            self._evict()
+        return response
+
+    @staticmethod
+    def _is_cacheable(body: bytes) -> bool:
+        # 只缓存正常的 JSON 结果，风控页面 / {"ok": 0} 之类的错误不缓存
+        if not body.lstrip().startswith(b'{'):
+            return False
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return False
+        return isinstance(data, dict) and data.get('ok', 1) not in (0, -100)
+
+    def _evict(self):
+        # 淘汰到上限的 90%，避免每次写入都触发淘汰
+        target = self.max_bytes * 0.9
+        evicted = 0
+        with self.conn:
+            rows = self.conn.execute('SELECT key, size FROM responses ORDER BY last_access').fetchall()
+            doomed = []
+            for key, size in rows:
+                if self.total_bytes <= target:
+                    break
+                doomed.append((key,))
+                self.total_bytes -= size
+                evicted += 1
+            self.conn.executemany('DELETE FROM responses WHERE key = ?', doomed)
+        self._inc('ttl_cache/evicted', evicted)
+
+    def spider_closed(self, spider):
+        total = self.hits + self.misses
+        if total:
+            spider.logger.info(
+                f"[ttl_cache] 命中 {self.hits} / 未命中 {self.misses}，命中率 {self.hits / total:.1%}，"
+                f"缓存占用 {self.total_bytes / 1024 / 1024:.1f} MB"
+            )
+        if self.stats and total:
+            self.stats.set_value('ttl_cache/hit_rate', round(self.hits / total, 4))
+        self.conn.close()
+
+
 class FullResponseDumpMiddleware:
     """
     当设置环境变量 DUMP_FULL_RESPONSE=1 时，将所有响应落地到
     weibospider/output/debug_responses，便于排查接口/数据问题。
+    文件中记录请求指纹，可由 ReplayMiddleware 回放；回放出来的响应不再重复落地。
     """
 
-    def __init__(self):
+    def __init__(self, fingerprinter=None):
         self.enabled = os.environ.get("DUMP_FULL_RESPONSE") == "1"
+        self.fingerprinter = fingerprinter
         if self.enabled:
             base_dir = pathlib.Path(__file__).resolve().parent.parent / "output" / "debug_responses"
             base_dir.mkdir(parents=True, exist_ok=True)
@@ -281,10 +813,10 @@ class FullResponseDumpMiddleware:
 
     @classmethod
     def from_crawler(cls, crawler):
-        return cls()
+        return cls(getattr(crawler, 'request_fingerprinter', None))
 
     def process_response(self, request, response, spider):
-        if not getattr(self, "enabled", False):
+        if not getattr(self, "enabled", False) or 'replay' in response.flags:
             return response
         mblogid = request.meta.get('mblogin') or request.meta.get('item', {}).get('mblogid') or "unknown"
         spider_name = getattr(spider, "name", "spider")
@@ -297,11 +829,16 @@ class FullResponseDumpMiddleware:
             label = re.sub(r'[^A-Za-z0-9_\\-]+', '_', label)
             if len(label) > 80:
                 label = label[:80]
-        filename = f"{spider_name}_{label}_{mblogid}_{response.status}.txt"
+        fingerprint = self.fingerprinter.fingerprint(request).hex() if self.fingerprinter else ''
+        # 带上指纹前缀，同一接口的不同请求（如搜索翻页）不会互相覆盖
+        suffix = f"_{fingerprint[:12]}" if fingerprint else ''
+        filename = f"{spider_name}_{label}_{mblogid}_{response.status}{suffix}.txt"
         path = self.debug_dir / filename
         try:
             with open(path, "w", encoding="utf-8") as f:
                 f.write(f"URL: {response.url}\n")
+                if fingerprint:
+                    f.write(f"Fingerprint: {fingerprint}\n")
                 f.write(f"Status: {response.status}\n")
                 f.write("Headers:\n")
                 for k, v in response.headers.items():
@@ -318,3 +855,306 @@ class FullResponseDumpMiddleware:
         except Exception as exc:
             spider.logger.warning(f"[debug_dump] 写入响应失败: {exc}")
         return response
+
+
+class ReplayMiddleware:
+    """
+    回放 FullResponseDumpMiddleware 录制的响应，不访问网络即可端到端跑完任意 spider：
+    - 启动时扫描 REPLAY_DIR 下的录制文件头，按请求指纹建索引（旧文件没有指纹时按规范化 URL）
+    - 命中时读取响应体并直接返回，可用 REPLAY_LATENCY 模拟下载延迟（±50% 随机抖动）
+    - 未命中的请求丢弃（IgnoreRequest），计入 stats 的 replay/miss
+    需排在账号、代理等中间件之后，使这些中间件的逻辑和开销照常计入
+    """
+
+    # 录制时的响应体已解码为文本，这些头回放时不再适用
+    dropped_headers = {'content-encoding', 'content-length', 'transfer-encoding'}
+
+    def __init__(self, directory, latency=0.0, fingerprinter=None, stats=None):
+        self.directory = directory
+        self.latency = latency
+        self.fingerprinter = fingerprinter
+        self.stats = stats
+        self.by_fingerprint: Dict[str, str] = {}
+        self.by_url: Dict[str, str] = {}
+        self._build_index()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('REPLAY_ENABLED', False):
+            raise NotConfigured
+        return cls(
+            settings.get('REPLAY_DIR', '../output/debug_responses'),
+            latency=settings.getfloat('REPLAY_LATENCY', 0.0),
+            fingerprinter=getattr(crawler, 'request_fingerprinter', None),
+            stats=crawler.stats,
+        )
+
+    def _build_index(self):
+        """
+        同一请求可能录到多份（如先 418 重试后 200，文件名中状态码不同），
+        按 2xx 优先、其次修改时间最新挑选，保证回放结果确定；冲突数计入 replay/collisions
+        """
+        if not os.path.isdir(self.directory):
+            return
+        ranks = {}
+        collisions = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith('.txt'):
+                continue
+            path = os.path.join(self.directory, name)
+            url = fingerprint = None
+            status = 0
+            with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+                for line in f:
+                    if line.startswith('URL: '):
+                        url = line[5:].rstrip('\n')
+                    elif line.startswith('Fingerprint: '):
+                        fingerprint = line[13:].rstrip('\n')
+                    elif line.startswith('Status: '):
+                        status = int(line[8:].strip() or 0)
+                        break
+                    elif line == 'Headers:\n':
+                        break
+            rank = (200 <= status < 300, os.path.getmtime(path))
+            for index, key in ((self.by_fingerprint, fingerprint), (self.by_url, url and canonicalize_url(url))):
+                if not key:
+                    continue
+                if key in index:
+                    if index is self.by_fingerprint or not fingerprint:
+                        collisions += 1
+                    if ranks[index[key]] >= rank:
+                        continue
+                index[key] = path
+            ranks[path] = rank
+        if self.stats is not None:
+            self.stats.set_value('replay/indexed', len(set(self.by_fingerprint.values()) | set(self.by_url.values())))
+            self.stats.set_value('replay/collisions', collisions)
+
+    def _lookup(self, request):
+        if self.fingerprinter:
+            path = self.by_fingerprint.get(self.fingerprinter.fingerprint(request).hex())
+            if path:
+                return path
+        return self.by_url.get(canonicalize_url(request.url))
+
+    def _load(self, path, request):
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            content = f.read()
+        head, _, body = content.partition('\nBody:\n')
+        url, status, headers = request.url, 200, Headers()
+        in_headers = False
+        for line in head.split('\n'):
+            if in_headers:
+                key, sep, value = line.partition(': ')
+                if sep and key.lower() not in self.dropped_headers:
+                    headers.appendlist(key, value)
+            elif line.startswith('URL: '):
+                url = line[5:]
+            elif line.startswith('Status: '):
+                status = int(line[8:])
+            elif line == 'Headers:':
+                in_headers = True
+        body = body.encode('utf-8')
+        respcls = responsetypes.from_args(headers=headers, url=url, body=body)
+        kwargs = {'encoding': 'utf-8'} if issubclass(respcls, TextResponse) else {}
+        return respcls(url=url, status=status, headers=headers, body=body, request=request, flags=['replay'], **kwargs)
+
+    async def process_request(self, request, spider):
+        path = self._lookup(request)
+        if not path:
+            if self.stats is not None:
+                self.stats.inc_value('replay/miss')
+            spider.logger.debug(f"[replay] 未录制的请求，已丢弃：{request.url}")
+            raise IgnoreRequest(f"no recorded response for {request.url}")
+        if self.latency > 0:
+            from twisted.internet import reactor
+
+            delay = self.latency * random.uniform(0.5, 1.5)
+            await maybe_deferred_to_future(task.deferLater(reactor, delay, lambda: None))
+            request.meta['download_latency'] = delay
+        if self.stats is not None:
+            self.stats.inc_value('replay/hit')
+        return self._load(path, request)
+
+
+class CallbackTiming:
+    """单个回调的耗时统计：精确的次数 / 总耗时 / 最大值 / 字节数，分位数基于定长蓄水池抽样"""
+
+    reservoir_size = 10000
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.bytes = 0
+        self.samples: List[float] = []
+
+    def record(self, elapsed: float, nbytes: int):
+        self.count += 1
+        self.total += elapsed
+        self.bytes += nbytes
+        if elapsed > self.max:
+            self.max = elapsed
+        if len(self.samples) < self.reservoir_size:
+            self.samples.append(elapsed)
+        else:
+            slot = random.randrange(self.count)
+            if slot < self.reservoir_size:
+                self.samples[slot] = elapsed
+
+    def percentile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(math.ceil(q * len(ordered))) - 1)]
+
+
+class StackSampler:
+    """
+    采样式 profiler：后台线程按固定间隔抓取 reactor 线程的调用栈，
+    输出 collapsed stack 格式（"帧;帧;帧 次数"），可直接交给 flamegraph.pl / speedscope 生成火焰图
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            key = ';'.join(reversed(names))
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    def dump(self, path: str):
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self.stacks.items(), key=lambda kv: -kv[1]):
+                f.write(f"{stack} {count}\n")
+
+
+class CallbackTimingMiddleware:
+    """
+    Spider 中间件：统计每个回调（parse、parse_tweet、parse_longtext_mobile 等）迭代输出所花的时间和解析的响应字节数，
+    spider 关闭时输出 p50/p90/p99/max 并写入 stats 的 callback_time/<回调>/*。
+    CALLBACK_PROFILE_ENABLED 开启时同时运行 StackSampler，结束后把 collapsed stack 写到 CALLBACK_PROFILE_PATH。
+    注意：只统计生成器回调在产出 item / request 期间的耗时，需排在其它 spider 中间件之后（靠近 spider）
+    """
+
+    def __init__(self, stats=None, profile=False, profile_interval=0.005, profile_path=None):
+        self.stats = stats
+        self.timings: Dict[str, CallbackTiming] = {}
+        self.profile = profile
+        self.profile_interval = profile_interval
+        self.profile_path = profile_path
+        self.sampler: Optional[StackSampler] = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('CALLBACK_TIMING_ENABLED', True):
+            raise NotConfigured
+        mw = cls(
+            stats=crawler.stats,
+            profile=settings.getbool('CALLBACK_PROFILE_ENABLED', False),
+            profile_interval=settings.getfloat('CALLBACK_PROFILE_INTERVAL', 0.005),
+            profile_path=settings.get('CALLBACK_PROFILE_PATH', '../output/profile/{spider}.collapsed'),
+        )
+        crawler.signals.connect(mw.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(mw.spider_closed, signal=signals.spider_closed)
+        return mw
+
+    def spider_opened(self, spider):
+        if self.profile:
+            # spider_opened 在 reactor 线程中触发
+            self.sampler = StackSampler(threading.get_ident(), self.profile_interval)
+            self.sampler.start()
+
+    def _timing_for(self, response) -> CallbackTiming:
+        callback = getattr(response.request, 'callback', None) if response.request is not None else None
+        name = getattr(callback, '__name__', None) or 'parse'
+        timing = self.timings.get(name)
+        if timing is None:
+            timing = self.timings[name] = CallbackTiming()
+        return timing
+
+    def process_spider_output(self, response, result, spider):
+        timing = self._timing_for(response)
+        elapsed = 0.0
+        iterator = iter(result)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    output = next(iterator)
+                except StopIteration:
+                    elapsed += time.perf_counter() - start
+                    break
+                elapsed += time.perf_counter() - start
+                yield output
+        finally:
+            timing.record(elapsed, len(response.body))
+
+    async def process_spider_output_async(self, response, result, spider):
+        timing = self._timing_for(response)
+        elapsed = 0.0
+        iterator = result.__aiter__()
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    output = await iterator.__anext__()
+                except StopAsyncIteration:
+                    elapsed += time.perf_counter() - start
+                    break
+                elapsed += time.perf_counter() - start
+                yield output
+        finally:
+            timing.record(elapsed, len(response.body))
+
+    def spider_closed(self, spider):
+        if self.sampler:
+            self.sampler.stop()
+            path = self.profile_path.format(spider=spider.name)
+            self.sampler.dump(path)
+            spider.logger.info(f"[callback_timing] 采样 profile 已写入 {path}")
+            self.sampler = None
+        for name, timing in sorted(self.timings.items(), key=lambda kv: -kv[1].total):
+            p50, p90, p99 = (timing.percentile(q) for q in (0.5, 0.9, 0.99))
+            mb = timing.bytes / 2 ** 20
+            spider.logger.info(
+                f"[callback_timing] {name}: 次数 {timing.count}，总耗时 {timing.total:.2f}s，"
+                f"p50 {p50 * 1000:.2f}ms p90 {p90 * 1000:.2f}ms p99 {p99 * 1000:.2f}ms max {timing.max * 1000:.2f}ms，"
+                f"解析 {mb:.1f}MB（{mb / timing.total if timing.total else 0:.1f}MB/s）"
+            )
+            if self.stats is not None:
+                prefix = f'callback_time/{name}'
+                self.stats.set_value(f'{prefix}/count', timing.count)
+                self.stats.set_value(f'{prefix}/total_s', round(timing.total, 4))
+                self.stats.set_value(f'{prefix}/p50_ms', round(p50 * 1000, 3))
+                self.stats.set_value(f'{prefix}/p90_ms', round(p90 * 1000, 3))
+                self.stats.set_value(f'{prefix}/p99_ms', round(p99 * 1000, 3))
+                self.stats.set_value(f'{prefix}/max_ms', round(timing.max * 1000, 3))
+                self.stats.set_value(f'{prefix}/bytes', timing.bytes)
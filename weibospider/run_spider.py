@@ -76,6 +76,14 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Run Weibo spider.')
     parser.add_argument('mode', type=str, help='Spider mode')
     parser.add_argument('--user_ids_file', type=str, help='Path to user_ids file', default=None)
+    parser.add_argument('--resume', action='store_true',
+                        help='Resume from the last checkpoint (tweet_by_keyword), skipping completed scopes')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only fetch comments newer than the last run (comment), ordered by time')
+    parser.add_argument('--replay', type=str, metavar='DIR', default=None,
+                        help='Serve responses recorded with DUMP_FULL_RESPONSE=1 from DIR instead of the network')
+    parser.add_argument('--replay-latency', type=float, default=0.0,
+                        help='Mean simulated download latency in seconds for --replay')
     args = parser.parse_args()
 
     mode = args.mode
@@ -83,6 +91,12 @@ if __name__ == '__main__':
 
     os.environ['SCRAPY_SETTINGS_MODULE'] = 'settings'
     settings = get_project_settings()
+    # 离线回放：响应全部来自录制目录，关闭 HTTP 缓存以免绕过回放
+    if args.replay:
+        settings.set('REPLAY_ENABLED', True)
+        settings.set('REPLAY_DIR', os.path.abspath(args.replay))
+        settings.set('REPLAY_LATENCY', args.replay_latency)
+        settings.set('HTTP_TTL_CACHE_ENABLED', False)
     process = CrawlerProcess(settings)
 
     # 仅当有需要时，可在此扩展映射
@@ -104,6 +118,20 @@ if __name__ == '__main__':
         print(f"Unsupported mode: {mode}")
         exit(1)
 
+    # 断点续跑参数，仅关键词模式支持
+    extra_kwargs = {}
+    if args.resume:
+        if mode == 'tweet_by_keyword':
+            extra_kwargs['resume'] = True
+        else:
+            print(f"--resume is not supported for mode: {mode}, ignored")
+    # 增量评论参数，仅评论模式支持
+    if args.incremental:
+        if mode == 'comment':
+            extra_kwargs['incremental'] = True
+        else:
+            print(f"--incremental is not supported for mode: {mode}, ignored")
+
     # 如果指定了 user_ids_file，则从文件中批量读取
     if user_ids_file:
         ids_list = parse_external_file(mode, user_ids_file)
@@ -113,14 +141,16 @@ if __name__ == '__main__':
                 spider_class,
                 ids_to_process=ids_list,
                 is_single=True,
-                single_id=ids_list[0]
+                single_id=ids_list[0],
+                **extra_kwargs
             )
         else:
             process.crawl(
                 spider_class,
                 ids_to_process=ids_list,
                 is_single=False,
-                single_id=None
+                single_id=None,
+                **extra_kwargs
             )
     else:
         # 未指定文件 => 采用爬虫内部默认的“单一”或“内置”逻辑
@@ -130,7 +160,8 @@ if __name__ == '__main__':
             spider_class,
             ids_to_process=None,
             is_single=True,   # 这里默认为 True，表示代码内通常写死一个 ID
-            single_id=None
+            single_id=None,
+            **extra_kwargs
         )
 
     process.start()
\ No newline at end of file
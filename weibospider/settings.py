@@ -18,15 +18,132 @@ CONCURRENT_REQUESTS_PER_DOMAIN = 100
 # 以每槽约 1.0s 间隔，单 Cookie+IP 约 60 条/分钟；若需 70，可调到 0.85
 DOWNLOAD_DELAY = 0.7
 
+# 账号级 AIMD 限速：按响应调整每个账号下载槽的 delay，DOWNLOAD_DELAY 仅作为初始值
+# 正常响应每秒约加 ACCOUNT_RATE_INCREASE（请求/秒），418/429/403 或命中反爬页面标记时乘以 ACCOUNT_RATE_DECREASE
+ACCOUNT_RATE_LIMIT_ENABLED = True
+ACCOUNT_RATE_MIN = 0.1
+ACCOUNT_RATE_MAX = 5.0
+ACCOUNT_RATE_INCREASE = 0.05
+ACCOUNT_RATE_DECREASE = 0.5
+ACCOUNT_RATE_THROTTLE_CODES = [418, 429, 403]
+ACCOUNT_RATE_BLOCK_MARKERS = ['Sina Visitor System', 'passport.weibo.com/visitor', '安全验证']
+
+# AccountSessionMiddleware 事件流（logs/events.jsonl）：每隔 N 秒写出一次账号计数并落盘缓冲的事件，0 表示只在结束时写
+ACCOUNT_EVENT_LOG_INTERVAL = 60
+# 缓冲事件达到该条数时立即落盘
+ACCOUNT_EVENT_LOG_BUFFER = 1000
+
 DOWNLOADER_MIDDLEWARES = {
     'scrapy.downloadermiddlewares.cookies.CookiesMiddleware': None,
     'scrapy.downloadermiddlewares.redirect.RedirectMiddleware': None,
+    # 幂等 ajax 接口的 TTL 缓存，需排在账号中间件之前，命中时不占用账号与代理
+    'middlewares.TTLResponseCacheMiddleware': 80,
     'middlewares.AccountSessionMiddleware': 90,
     'scrapy.downloadermiddlewares.httpproxy.HttpProxyMiddleware': 95,
     # 可通过环境变量 DUMP_FULL_RESPONSE=1 开启全量响应调试
     'middlewares.FullResponseDumpMiddleware': 200,
+    # 离线回放录制的响应（REPLAY_ENABLED 开启），排在最后以保留其它中间件的逻辑
+    'middlewares.ReplayMiddleware': 990,
+}
+
+SPIDER_MIDDLEWARES = {
+    # 回调耗时与解析字节统计，排在内置 spider 中间件之后以只计回调本身
+    'middlewares.CallbackTimingMiddleware': 950,
+}
+
+EXTENSIONS = {
+    # 实时指标页（Prometheus 文本格式），METRICS_ENABLED 开启
+    'extensions.MetricsExtension': 500,
 }
 
 ITEM_PIPELINES = {
+    # 可选：跨运行按 _id 去重（Bloom 过滤器，需在写出类 pipeline 之前）
+    # 'pipelines.DedupPipeline': 200,
     'pipelines.JsonWriterPipeline': 300,
+    # 可选：写入 SQLite（按 _id upsert，每个 spider 一张表）
+    # 'pipelines.SqlitePipeline': 310,
 }
+
+# JSONL 输出：缓冲模式下序列化与写盘在后台线程完成，不阻塞 reactor（默认关闭，按需开启）
+JSONL_WRITER_BUFFERED = False
+# 队列上限（满了会对上游形成背压）、按条数 / 按秒的刷盘阈值
+JSONL_WRITER_QUEUE_SIZE = 10000
+JSONL_WRITER_FLUSH_ITEMS = 500
+JSONL_WRITER_FLUSH_INTERVAL = 2.0
+# 序列化后端：auto（已安装 orjson 则使用，否则标准库）/ orjson / json
+JSONL_SERIALIZER = 'auto'
+# 流式压缩：None / 'gzip' / 'zstd'（zstd 需 Python 3.14+ 或 backports.zstd），LEVEL 为 None 时用默认级别
+JSONL_COMPRESSION = None
+JSONL_COMPRESSION_LEVEL = None
+# 按未压缩字节数 / 条数切分输出文件，0 表示不切分；开启压缩或切分时会写 {stem}.manifest.json
+JSONL_ROTATE_BYTES = 0
+JSONL_ROTATE_ITEMS = 0
+
+# SqlitePipeline：数据库路径与每个事务的批量条数
+SQLITE_PATH = '../output/weibo.sqlite3'
+SQLITE_BATCH_SIZE = 500
+
+# DedupPipeline：过滤器目录、容量（预计 _id 总数）与误判率
+DEDUP_DIR = '../output/dedup'
+DEDUP_CAPACITY = 50_000_000
+DEDUP_ERROR_RATE = 0.001
+
+# TTLResponseCacheMiddleware：按接口路径配置缓存秒数，缓存体压缩存于本地，超过上限按 LRU 淘汰
+# 默认关闭：开启后 TTL 内重跑会拿到旧的转发 / 评论 / 点赞数
+HTTP_TTL_CACHE_ENABLED = False
+HTTP_TTL_CACHE_PATH = '../output/http_cache/responses.sqlite3'
+HTTP_TTL_CACHE_MAX_BYTES = 512 * 1024 * 1024
+HTTP_TTL_CACHE_ENDPOINTS = {
+    '/ajax/statuses/show': 3600,
+    '/ajax/profile/info': 86400,
+    '/ajax/profile/detail': 7 * 86400,
+}
+
+# UserSpider：mblogid => uid 映射缓存（追加写入，跨运行复用）
+USER_UID_CACHE_PATH = '../output/cache/mblogid_uid.tsv'
+
+# 评论增量模式（--incremental）：每条微博 / 一级评论已采集到的最新评论 ID
+COMMENT_INCREMENTAL_PATH = '../output/cache/comment_newest.tsv'
+
+# TweetSpiderByKeyword：时间段进度检查点（--resume 时从这里继续）
+KEYWORD_CHECKPOINT_PATH = '../output/checkpoints/tweet_spider_by_keyword.json'
+# 每个关键词同时翻页的时间段数；账号池越大可设越高，1 即逐段顺序抓取
+KEYWORD_SCOPES_IN_FLIGHT = 4
+# 时间窗口模式：fixed（按小时固定切分）/ adaptive（达到 50 页上限拆分、稀疏时合并）
+KEYWORD_TIMESCOPE_MODE = 'fixed'
+# adaptive 模式：初始窗口小时数、合并后的最大小时数、页数不超过该值视为稀疏
+KEYWORD_ADAPTIVE_INITIAL_HOURS = 6
+KEYWORD_ADAPTIVE_MAX_HOURS = 72
+KEYWORD_ADAPTIVE_SPARSE_PAGES = 1
+# 连续多少个稀疏窗口后才合并（窗口加倍）
+KEYWORD_ADAPTIVE_SPARSE_STREAK = 2
+
+# TweetSpiderByUserID：自适应时间窗口（初始天数、上下限、每个窗口期望的微博数）
+USER_TWEET_WINDOW_INITIAL_DAYS = 10
+USER_TWEET_WINDOW_MIN_DAYS = 1
+USER_TWEET_WINDOW_MAX_DAYS = 180
+USER_TWEET_WINDOW_TARGET_TWEETS = 60
+# 每个用户同时翻页的时间窗口数，1 即逐个窗口顺序抓取
+USER_TWEET_WINDOWS_IN_FLIGHT = 4
+
+# 转发 / 粉丝 / 关注：按返回总数规划页数后，同一目标同时在途的最大页数
+PAGINATION_FANOUT_PER_TARGET = 4
+
+# 实时指标：http://METRICS_HOST:METRICS_PORT/metrics，item/s 按 METRICS_RATE_INTERVAL 秒滑动计算
+METRICS_ENABLED = False
+METRICS_HOST = '127.0.0.1'
+METRICS_PORT = 9410
+METRICS_RATE_INTERVAL = 10
+METRICS_LATENCY_BUCKETS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+
+# 回调耗时统计（spider 关闭时输出分位数）；CALLBACK_PROFILE_ENABLED 额外开启采样 profiler，输出火焰图可用的 collapsed stack
+CALLBACK_TIMING_ENABLED = True
+CALLBACK_PROFILE_ENABLED = False
+CALLBACK_PROFILE_INTERVAL = 0.005
+CALLBACK_PROFILE_PATH = '../output/profile/{spider}.collapsed'
+
+# 离线回放：从 REPLAY_DIR 读取 FullResponseDumpMiddleware 录制的响应（DUMP_FULL_RESPONSE=1 录制），不访问网络
+# REPLAY_LATENCY 为模拟下载延迟的均值（秒），0 表示立即返回；也可用 run_spider.py --replay 开启
+REPLAY_ENABLED = False
+REPLAY_DIR = '../output/debug_responses'
+REPLAY_LATENCY = 0.0
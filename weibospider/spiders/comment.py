@@ -1,4 +1,8 @@
 import json
+import os
+from array import array
+from bisect import bisect_left
+from itertools import chain
 from urllib.parse import urlencode
 
 from scrapy import Spider
@@ -7,27 +11,138 @@ from scrapy.http import Request
 from spiders.common import parse_user_info, parse_time, url_to_mid
 
 
+class CommentThread:
+    """
+    单个评论楼（一条微博的一级评论，或一条评论下的二级评论）的翻页状态。
+    已见评论 ID 存在有序的 int64 数组里（每条 8 字节），翻页结束后整体释放。
+    热度 / 时间排序返回的 ID 都不单调（时间序是降序），新 ID 先进小 set，攒够数组长度的 1/4
+    （至少 MIN_BATCH）或每页结束时 set 已达数组的 1/4，再整批归并进数组，避免逐条在数组中间插入
+    """
+    __slots__ = ('ids', 'pending', 'limit', 'last_max_id')
+
+    MIN_BATCH = 1024
+    # 归并后共用的空集合，避免每个楼常驻一个空 set
+    _NO_PENDING = frozenset()
+
+    def __init__(self):
+        self.ids = array('q')
+        self.pending = self._NO_PENDING
+        self.limit = self.MIN_BATCH
+        self.last_max_id = 0
+
+    def __len__(self):
+        return len(self.ids) + len(self.pending)
+
+    def add(self, comment_id):
+        """加入评论 ID，已存在返回 False"""
+        comment_id = int(comment_id)
+        pending = self.pending
+        if comment_id in pending:
+            return False
+        ids = self.ids
+        if ids and ids[0] <= comment_id <= ids[-1]:
+            pos = bisect_left(ids, comment_id)
+            if ids[pos] == comment_id:
+                return False
+        if pending is self._NO_PENDING:
+            pending = self.pending = set()
+        pending.add(comment_id)
+        if len(pending) >= self.limit:
+            self._merge()
+        return True
+
+    def end_page(self):
+        """一页处理完：小楼直接归并（常驻只剩数组），大楼等 set 攒到数组的 1/4 再归并"""
+        if self.pending and len(self.pending) >= len(self.ids) >> 2:
+            self._merge()
+
+    def _merge(self):
+        # 两段有序序列拼接后 timsort 只做一次线性归并
+        self.ids = array('q', sorted(chain(self.ids, sorted(self.pending))))
+        self.pending = self._NO_PENDING
+        self.limit = max(self.MIN_BATCH, len(self.ids) >> 2)
+
+    def newest(self):
+        """已见的最大评论 ID，没有时返回 0"""
+        newest = self.ids[-1] if self.ids else 0
+        if self.pending:
+            newest = max(newest, max(self.pending))
+        return newest
+
+
 class CommentSpider(Spider):
     """
     微博评论数据采集
+    增量模式：按时间排序（flow=1）抓取，每条微博 / 每条一级评论已采集到的最新评论 ID
+    记录在 COMMENT_INCREMENTAL_PATH，再次运行时翻到已知评论即停止
     """
 
     name = "comment"
 
-    def __init__(self, ids_to_process=None, is_single=False, single_id=None, flow=0, *args, **kwargs):
+    def __init__(self, ids_to_process=None, is_single=False, single_id=None, flow=0, incremental=False, *args, **kwargs):
         """
         :param ids_to_process: 外部文件传入的 mblogid 列表
         :param is_single: 是否只有单个ID
         :param single_id: 单个ID的值（若 is_single=True，则可用 single_id）
         :param flow: 评论排序模式（0=热度，1=按时间；首条请求不携带 flow）
+        :param incremental: 增量抓取，强制 flow=1 且首条请求也携带 flow
         """
         super().__init__(*args, **kwargs)
         self.ids_to_process = ids_to_process or []
         self.is_single = is_single
         self.single_id = single_id
-        self.flow = 1 if str(flow) == "1" else 0
-        self.seen_comment_ids = {}
-        self.last_max_id = {}
+        self.incremental = str(incremental).lower() in ('1', 'true')
+        self.flow = 1 if self.incremental or str(flow) == "1" else 0
+        # (target_id, fetch_level) -> CommentThread，仅保存仍在翻页的评论楼
+        self.threads = {}
+        # 增量模式：(target_id, fetch_level) -> 上次已采集到的最新评论 ID
+        self.newest_known = {}
+        self.newest_file = None
+        self.known_stops = 0
+        self.skipped_known = 0
+
+    def _load_newest_known(self):
+        path = self.settings.get('COMMENT_INCREMENTAL_PATH', '../output/cache/comment_newest.tsv')
+        cache_dir = os.path.dirname(path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    parts = line.rstrip('\n').split('\t')
+                    if len(parts) != 3 or not parts[2].isdigit():
+                        continue
+                    key = (parts[1], int(parts[0]))
+                    newest = int(parts[2])
+                    if newest > self.newest_known.get(key, 0):
+                        self.newest_known[key] = newest
+        # 追加写入，后写的同键记录覆盖先写的
+        self.newest_file = open(path, 'a', encoding='utf-8')
+        self.logger.info(f"[incremental] 已加载 {len(self.newest_known)} 条评论楼的最新评论 ID")
+
+    def _finish_thread(self, key, record=True):
+        """
+        评论楼翻页结束：释放状态；增量模式下把本次最新评论 ID 记为新的起点。
+        翻页失败时 record=False：只释放状态，不推进起点，下次运行重新抓取缺失的部分
+        """
+        thread = self.threads.pop(key, None)
+        if not record or not self.incremental or thread is None or not len(thread):
+            return
+        store_key = (str(key[0]), key[1])
+        newest = thread.newest()
+        if newest > self.newest_known.get(store_key, 0):
+            self.newest_known[store_key] = newest
+            if self.newest_file:
+                self.newest_file.write(f"{key[1]}\t{store_key[0]}\t{newest}\n")
+
+    def closed(self, reason):
+        if self.newest_file:
+            self.newest_file.close()
+            self.newest_file = None
+        if self.incremental:
+            self.logger.info(
+                f"[incremental] 翻到已知评论提前停止 {self.known_stops} 个评论楼，跳过已知评论 {self.skipped_known} 条"
+            )
 
     def start_requests(self):
         # 如果外部没传IDs，就走内部预设
@@ -35,6 +150,9 @@ class CommentSpider(Spider):
             # 这里给一个演示用途的 mblogid
             self.ids_to_process = [""]  # 举例
 
+        if self.incremental:
+            self._load_newest_known()
+
         for idx, mblogid in enumerate(self.ids_to_process):
             mblogid = (mblogid or "").strip()
             if not mblogid:
@@ -51,7 +169,7 @@ class CommentSpider(Spider):
             yield self._build_comment_request(
                 target_id=mid,
                 fetch_level=0,
-                include_flow=False,
+                include_flow=self.incremental,
                 meta=meta,
                 priority=100000 - idx,
             )
@@ -59,22 +177,39 @@ class CommentSpider(Spider):
     def parse(self, response, **kwargs):
         mblogin = response.meta.get('mblogin')
         fetch_level = response.meta.get('fetch_level', 0)
-        data = json.loads(response.text)
         target_id = response.meta.get('target_id')
-        key = (mblogin, target_id, fetch_level)
-        seen_ids = self.seen_comment_ids.setdefault(key, set())
+        key = (target_id, fetch_level)
+        try:
+            data = json.loads(response.text)
+        except ValueError as exc:
+            self.logger.warning(f"评论接口返回非 JSON，target_id={target_id} fetch_level={fetch_level}: {exc}")
+            self._finish_thread(key, record=False)
+            return
+        thread = self.threads.get(key)
+        if thread is None:
+            thread = self.threads[key] = CommentThread()
         new_found = 0
+        # 增量模式：按时间倒序，页内最旧一条已知即说明已接上上次的进度（置顶评论可能排在页首，不能看第一条）
+        watermark = self.newest_known.get((str(target_id), fetch_level), 0) if self.incremental else 0
+        reached_known = False
 
         for comment_info in data.get('data', []):
             comment_id = comment_info.get('id')
-            if comment_id in seen_ids:
+            if comment_id is None:
                 continue
-            seen_ids.add(comment_id)
-            new_found += 1
-            item = self.parse_comment(comment_info)
-            # 为了在 pipeline 中能将其置于最前面，我们这里就直接命名为 mblogin
-            item['mblogin'] = mblogin
-            yield item
+            if watermark:
+                reached_known = int(comment_id) <= watermark
+            if not thread.add(comment_id):
+                continue
+            if reached_known:
+                # 已知的一级评论本身跳过，但其下可能有新回复，仍请求二级评论，由该楼自己的水位停止
+                self.skipped_known += 1
+            else:
+                new_found += 1
+                item = self.parse_comment(comment_info)
+                # 为了在 pipeline 中能将其置于最前面，我们这里就直接命名为 mblogin
+                item['mblogin'] = mblogin
+                yield item
 
             # 解析二级评论
             if 'more_info' in comment_info:
@@ -87,36 +222,34 @@ class CommentSpider(Spider):
                 yield self._build_comment_request(
                     target_id=comment_info['id'],
                     fetch_level=1,
-                    include_flow=False,
+                    include_flow=self.incremental,
                     meta=child_meta,
                     priority=20,
                 )
 
-        if new_found == 0:
-            return
-
-        # 翻页
+        thread.end_page()
+        # 翻页；没有新评论、没有 max_id、max_id 重复或已接上已知评论时该楼结束，释放状态
         max_id = data.get('max_id', 0)
-        if max_id:
-            max_id_str = str(max_id)
-            last_key = (mblogin, fetch_level, target_id)
-            if self.last_max_id.get(last_key) == max_id_str:
-                return
-            self.last_max_id[last_key] = max_id_str
-            next_meta = {
-                'mblogin': mblogin,
-                'target_id': target_id,
-                'fetch_level': fetch_level,
-                'referer': response.meta.get('referer'),
-            }
-            yield self._build_comment_request(
-                target_id=target_id,
-                fetch_level=fetch_level,
-                include_flow=True,
-                meta=next_meta,
-                max_id=max_id,
-                max_id_type=data.get('max_id_type', 0),
-            )
+        if reached_known:
+            self.known_stops += 1
+        if new_found == 0 or not max_id or thread.last_max_id == int(max_id) or reached_known:
+            self._finish_thread(key)
+            return
+        thread.last_max_id = int(max_id)
+        next_meta = {
+            'mblogin': mblogin,
+            'target_id': target_id,
+            'fetch_level': fetch_level,
+            'referer': response.meta.get('referer'),
+        }
+        yield self._build_comment_request(
+            target_id=target_id,
+            fetch_level=fetch_level,
+            include_flow=True,
+            meta=next_meta,
+            max_id=max_id,
+            max_id_type=data.get('max_id_type', 0),
+        )
 
     @staticmethod
     def parse_comment(data):
@@ -161,12 +294,22 @@ class CommentSpider(Spider):
         return Request(
             url,
             callback=self.parse,
+            errback=self._handle_comment_error,
             headers=headers,
             meta=request_meta,
             dont_filter=True,
             priority=priority,
         )
 
+    def _handle_comment_error(self, failure):
+        """翻页请求失败（HTTP 错误、下载异常）：释放该楼状态"""
+        meta = failure.request.meta
+        self.logger.warning(
+            f"评论请求失败，target_id={meta.get('target_id')} fetch_level={meta.get('fetch_level')}: "
+            f"{failure.getErrorMessage()}"
+        )
+        self._finish_thread((meta.get('target_id'), meta.get('fetch_level', 0)), record=False)
+
     @staticmethod
     def _build_headers(referer):
         headers = {
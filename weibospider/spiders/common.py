@@ -1,6 +1,8 @@
+import calendar
 import html
 import json
 import re
+from functools import lru_cache
 import dateutil.parser
 
 
@@ -14,37 +16,66 @@ def _strip_weibo_html(text: str) -> str:
     return html.unescape(text).replace('\u200b', '').strip()
 
 
-def extract_longtext_from_mobile(html: str):
+_RENDER_DATA_RE = re.compile(r'\$render_data\s*=\s*')
+# 只关心结构字符与字符串起点，其余内容由正则在 C 层跳过
+_JSON_TOKEN_RE = re.compile(r'["\[\]{}]')
+# 从字符串内部起点匹配到闭合引号（展开写法，避免逐字符回溯）
+_JSON_STRING_TAIL_RE = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+_JSON_DECODER = json.JSONDecoder()
+
+
+def _find_render_status(html: str):
     """
-    从 m.weibo.cn/detail 页面的 $render_data 提取长文本内容。
-    兼容原生脚本形如 `var $render_data = [...]` 或 `var $render_data = [...]][0] || {};`
+    单次线性扫描 `$render_data = [...]`，按括号深度定位第一个顶层对象中的 "status" 键，
+    只对该对象做 json 解码，不解析整个 render 数组。找不到时返回 None。
     """
-    patterns = [
-        # 常见：var $render_data = [{...}][0] || {};
-        r'\$render_data\s*=\s*(\[.*?\])\s*\[0\]',
-        # 次要：var $render_data = [{...}];
-        r'\$render_data\s*=\s*(\[.*?\])\s*(?:;|\|\|)',
-    ]
-    render_json = None
-    for pat in patterns:
-        match = re.search(pat, html, re.DOTALL)
-        if match:
-            render_json = match.group(1)
-            break
-    if not render_json:
+    match = _RENDER_DATA_RE.search(html)
+    if not match or html[match.end():match.end() + 1] != '[':
         return None
+    pos = match.end()
+    depth = 0
+    while True:
+        token = _JSON_TOKEN_RE.search(html, pos)
+        if not token:
+            return None
+        idx = token.start()
+        ch = html[idx]
+        if ch == '"':
+            tail = _JSON_STRING_TAIL_RE.match(html, idx + 1)
+            if not tail:
+                return None
+            pos = tail.end()
+            # depth == 2：位于 render 数组的顶层对象内，且后面紧跟冒号才是键
+            if depth == 2 and html[idx + 1:pos - 1] == 'status':
+                colon = pos
+                while colon < len(html) and html[colon] in ' \t\r\n':
+                    colon += 1
+                if colon < len(html) and html[colon] == ':':
+                    value_start = colon + 1
+                    while value_start < len(html) and html[value_start] in ' \t\r\n':
+                        value_start += 1
+                    try:
+                        status, _ = _JSON_DECODER.raw_decode(html, value_start)
+                    except ValueError:
+                        return None
+                    return status if isinstance(status, dict) else None
+            continue
+        if ch in '[{':
+            depth += 1
+        else:
+            depth -= 1
+            if depth <= 0:
+                # render 数组已结束仍未找到 status
+                return None
+        pos = idx + 1
 
-    try:
-        render_data = json.loads(render_json)
-    except Exception:
-        return None
 
-    status = None
-    blocks = render_data if isinstance(render_data, list) else [render_data]
-    for block in blocks:
-        if isinstance(block, dict) and 'status' in block:
-            status = block['status']
-            break
+def extract_longtext_from_mobile(html: str):
+    """
+    从 m.weibo.cn/detail 页面的 $render_data 提取长文本内容。
+    兼容原生脚本形如 `var $render_data = [...]` 或 `var $render_data = [...]][0] || {};`
+    """
+    status = _find_render_status(html)
     if not status:
         return None
 
@@ -61,17 +92,37 @@ def extract_longtext_from_mobile(html: str):
         content = _strip_weibo_html(content)
     return content
 
+BASE62_ALPHABET = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+_BASE62_INDEX = {char: idx for idx, char in enumerate(BASE62_ALPHABET)}
+# 1~2 位 base62 片段 => 数值 的查表，4 位分组只需两次查表
+_BASE62_PAIR_DECODE = dict(_BASE62_INDEX)
+_BASE62_PAIR_DECODE.update({a + b: i * 62 + j
+                            for i, a in enumerate(BASE62_ALPHABET)
+                            for j, b in enumerate(BASE62_ALPHABET)})
+# 数值(0~3843) => 定长 2 位 base62 片段
+_BASE62_PAIR_ENCODE = [a + b for a in BASE62_ALPHABET for b in BASE62_ALPHABET]
+
+
 def base62_decode(string):
-    alphabet = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
-    string = str(string)
     num = 0
-    idx = 0
-    for char in string:
-        power = (len(string) - (idx + 1))
-        num += alphabet.index(char) * (len(alphabet) ** power)
-        idx += 1
+    for char in str(string):
+        try:
+            num = num * 62 + _BASE62_INDEX[char]
+        except KeyError:
+            raise ValueError(f"invalid base62 character: {char!r}") from None
     return num
 
+
+def base62_encode(num):
+    num = int(num)
+    if num == 0:
+        return BASE62_ALPHABET[0]
+    chars = []
+    while num:
+        num, rem = divmod(num, 62)
+        chars.append(BASE62_ALPHABET[rem])
+    return ''.join(reversed(chars))
+
 def reverse_cut_to_length(content, code_func, cut_num=4, fill_num=7):
     content = str(content)
     cut_list = [content[i - cut_num if i >= cut_num else 0:i] for i in range(len(content), 0, (-1 * cut_num))]
@@ -84,20 +135,111 @@ def reverse_cut_to_length(content, code_func, cut_num=4, fill_num=7):
         result.append(s)
     return ''.join(result)
 
+
+def _decode_group(group):
+    if len(group) <= 2:
+        return _BASE62_PAIR_DECODE[group]
+    return _BASE62_PAIR_DECODE[group[:-2]] * 3844 + _BASE62_PAIR_DECODE[group[-2:]]
+
+
 def url_to_mid(url: str):
     """
     将 base62 格式的 mblogid => 数字mid
     例如: url_to_mid('z0JH2lOMb') => 3501756485200075
+    从右往左每 4 位一组解码，除首组外每组补足 7 位十进制
+    """
+    url = str(url)
+    head = len(url) % 4 or 4
+    try:
+        mid = _decode_group(url[:head])
+        for i in range(head, len(url), 4):
+            value = _decode_group(url[i:i + 4])
+            # 4 位 base62 最大为 8 位十进制，与字符串拼接的旧实现保持一致
+            mid = mid * (10000000 if value < 10000000 else 100000000) + value
+    except KeyError:
+        raise ValueError(f"invalid mblogid: {url!r}") from None
+    return mid
+
+
+def mid_to_url(mid):
+    """
+    url_to_mid 的逆运算：数字mid => base62 格式的 mblogid
+    例如: mid_to_url(3501756485200075) => 'z0JH2lOMb'
+    从右往左每 7 位一组编码，除首组外每组补足 4 位 base62
     """
-    result = reverse_cut_to_length(url, base62_decode)
-    return int(result)
+    mid = str(mid).strip()
+    if not mid.isdigit():
+        raise ValueError(f"invalid mid: {mid!r}")
+    head = len(mid) % 7 or 7
+    parts = [base62_encode(mid[:head])]
+    for i in range(head, len(mid), 7):
+        hi, lo = divmod(int(mid[i:i + 7]), 3844)
+        parts.append(_BASE62_PAIR_ENCODE[hi] + _BASE62_PAIR_ENCODE[lo])
+    return ''.join(parts)
 
+
+def urls_to_mids(urls):
+    """
+    批量 mblogid => mid，按输入顺序返回 int 列表
+    """
+    return [url_to_mid(url) for url in urls]
+
+
+def mids_to_urls(mids):
+    """
+    批量 mid => mblogid，按输入顺序返回字符串列表；已是 mblogid 的直接原样返回，便于统一规范化
+    """
+    return [str(mid) if not str(mid).isdigit() else mid_to_url(mid) for mid in mids]
+
+_MONTHS = {
+    'Jan': '01', 'Feb': '02', 'Mar': '03', 'Apr': '04', 'May': '05', 'Jun': '06',
+    'Jul': '07', 'Aug': '08', 'Sep': '09', 'Oct': '10', 'Nov': '11', 'Dec': '12',
+}
+
+
+def _parse_weibo_time_fast(s):
+    """
+    只处理微博接口固定的 `Wed Oct 19 23:44:36 +0800 2022` 格式，不匹配时返回 None。
+    与 dateutil 一致：保留原始时区下的钟面时间，不做时区换算。
+    """
+    parts = s.split()
+    if len(parts) != 6:
+        return None
+    _, mon, day, hms, tz, year = parts
+    month = _MONTHS.get(mon)
+    if not month or not day.isdigit() or len(day) > 2 or not year.isdigit() or len(year) != 4:
+        return None
+    if len(hms) != 8 or hms[2] != ':' or hms[5] != ':' or not (hms[:2] + hms[3:5] + hms[6:]).isdigit():
+        return None
+    if tz[0] not in '+-' or not tz[1:].isdigit():
+        return None
+    if int(hms[:2]) > 23 or int(hms[3:5]) > 59 or int(hms[6:]) > 59 or int(year) < 1:
+        return None
+    # 按当月实际天数校验（含闰年），不存在的日期交给 dateutil 报错
+    if not 1 <= int(day) <= calendar.monthrange(int(year), int(month))[1]:
+        return None
+    return f"{year}-{month}-{day.zfill(2)} {hms}"
+
+
+@lru_cache(maxsize=65536)
 def parse_time(s):
     """
     将形如 Wed Oct 19 23:44:36 +0800 2022 的微博时间转换为 2022-10-19 23:44:36
+    固定格式走快速路径，其它格式回退到 dateutil；同一字符串的结果会被缓存
+    （同一用户的 created_at 在评论/转发中会反复出现）。
     """
+    fast = _parse_weibo_time_fast(s) if isinstance(s, str) else None
+    if fast is not None:
+        return fast
     return dateutil.parser.parse(s).strftime('%Y-%m-%d %H:%M:%S')
 
+
+def parse_times(values):
+    """
+    批量版本的 parse_time，按输入顺序返回结果列表
+    """
+    return [parse_time(v) for v in values]
+
 def parse_user_info(data):
     user = {
         "_id": str(data['id']),
@@ -2,13 +2,16 @@ import json
 from scrapy import Spider
 from scrapy.http import Request
 from spiders.comment import parse_user_info
+from spiders.pagination import FanoutPaginationMixin
 
-class FanSpider(Spider):
+class FanSpider(FanoutPaginationMixin, Spider):
     """
     微博粉丝数据采集
+    按接口返回的 total_number 规划页数，同一用户的多页并发抓取
     """
     name = "fan"
     base_url = 'https://weibo.com/ajax/friendships/friends'
+    fanout_target_key = 'user_id'
 
     def __init__(self, ids_to_process=None, is_single=False, single_id=None, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -22,11 +25,21 @@ class FanSpider(Spider):
             self.ids_to_process = ['6148092570']
 
         for idx, user_id in enumerate(self.ids_to_process):
-            url = f"{self.base_url}?relate=fans&page=1&uid={user_id}&type=fans"
-            yield Request(url, callback=self.parse, meta={'user_id': user_id, 'page_num': 1}, priority=100000 - idx)
+            self._fanout_start(user_id)
+            yield self._fanout_request({'user_id': user_id}, 1, priority=100000 - idx)
+
+    def _fanout_request(self, meta, page_num, priority=0):
+        user_id = meta['user_id']
+        url = f"{self.base_url}?relate=fans&page={page_num}&uid={user_id}&type=fans"
+        return Request(url, callback=self.parse, errback=self._fanout_errback,
+                       meta={'user_id': user_id, 'page_num': page_num}, priority=priority)
 
     def parse(self, response, **kwargs):
-        data = json.loads(response.text)
+        try:
+            data = json.loads(response.text)
+        except ValueError as exc:
+            yield from self._fanout_page_failed(response.meta, f"json_error={exc}")
+            return
         user_id = response.meta['user_id']
         for user in data.get('users', []):
             item = dict()
@@ -36,7 +49,11 @@ class FanSpider(Spider):
             item['_id'] = user_id + '_' + item['fan_info']['_id']
             yield item
 
-        if data.get('users'):
-            page_num = response.meta['page_num'] + 1
-            url = f"{self.base_url}?relate=fans&page={page_num}&uid={user_id}&type=fans"
-            yield Request(url, callback=self.parse, meta={'user_id': user_id, 'page_num': page_num})
+        next_pages = self._fanout_next_pages(
+            user_id,
+            response.meta['page_num'],
+            len(data.get('users') or []),
+            total=data.get('total_number'),
+        )
+        for page_num in next_pages:
+            yield self._fanout_request(response.meta, page_num)
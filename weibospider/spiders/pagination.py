@@ -0,0 +1,86 @@
+import math
+
+
+class FanoutPaginationMixin:
+    """
+    按接口返回的总数规划页数，并对同一目标并发请求多页。
+    - 首页返回后，根据 max_page 或 total / 首页条数 计算计划页数
+    - 同一目标同时最多 PAGINATION_FANOUT_PER_TARGET 页在途，每返回一页补一页
+    - 计划页数取完即停，不再多请求一次空页；中途出现空页则不再发新页
+    - 拿不到总数时退化为逐页翻到空页为止
+    - 某页失败（HTTP 错误、下载异常、非 JSON）只跳过该页并释放名额，补发后续页
+    使用方：设置 fanout_target_key（meta 中目标 ID 的键）并实现 _fanout_request(meta, page_num)，
+    在发首页请求前调用 _fanout_start(target)，每页返回后用 _fanout_next_pages 取下一批页码，
+    请求的 errback 设为 _fanout_errback
+    """
+
+    fanout_target_key = None
+
+    def _fanout_limit(self):
+        return max(1, self.settings.getint('PAGINATION_FANOUT_PER_TARGET', 4))
+
+    def _fanout_start(self, target):
+        if not hasattr(self, '_fanout'):
+            self._fanout = {}
+        self._fanout[target] = {'planned': None, 'next_page': 2, 'in_flight': {1}, 'stopped': False}
+
+    def _fanout_next_pages(self, target, page, count, total=None, max_page=None):
+        """
+        :param page: 刚返回的页码
+        :param count: 该页条数
+        :param total: 接口返回的总条数（可选）
+        :param max_page: 接口返回的总页数（可选）
+        :return: 现在应当发出的页码列表
+        """
+        state = self._fanout.get(target)
+        if state is None:
+            return []
+        state['in_flight'].discard(page)
+        if not count:
+            state['stopped'] = True
+        if state['planned'] is None and count:
+            if isinstance(max_page, int) and max_page > 0:
+                state['planned'] = max_page
+            elif isinstance(total, int) and total > 0:
+                state['planned'] = math.ceil(total / count) if page == 1 else None
+            if state['planned'] is not None:
+                self.logger.debug(f"[fanout] target={target} total={total} max_page={max_page} planned={state['planned']}")
+
+        return self._fanout_fill(target, state)
+
+    def _fanout_release(self, target, page):
+        """失败的页释放名额（不视为空页），返回补发的页码列表"""
+        state = getattr(self, '_fanout', {}).get(target)
+        if state is None:
+            return []
+        state['in_flight'].discard(page)
+        return self._fanout_fill(target, state)
+
+    def _fanout_fill(self, target, state):
+        pages = []
+        if not state['stopped']:
+            planned = state['planned']
+            if planned is None:
+                # 没有总数：逐页翻到空页
+                if not state['in_flight']:
+                    pages.append(state['next_page'])
+            else:
+                while len(state['in_flight']) + len(pages) < self._fanout_limit() and state['next_page'] + len(pages) <= planned:
+                    pages.append(state['next_page'] + len(pages))
+        state['next_page'] += len(pages)
+        state['in_flight'].update(pages)
+        if not state['in_flight']:
+            # 目标全部完成，释放状态
+            del self._fanout[target]
+        return pages
+
+    def _fanout_page_failed(self, meta, reason):
+        target = meta[self.fanout_target_key]
+        page = meta['page_num']
+        self.logger.warning(f"[fanout] target={target} page={page} failed, skipped, reason={reason}")
+        self.crawler.stats.inc_value('fanout/failed_pages')
+        for page_num in self._fanout_release(target, page):
+            yield self._fanout_request(meta, page_num)
+
+    def _fanout_errback(self, failure):
+        yield from self._fanout_page_failed(failure.request.meta, repr(getattr(failure, 'value', failure)))
@@ -2,12 +2,15 @@ import json
 from scrapy import Spider
 from scrapy.http import Request
 from spiders.common import parse_tweet_info, url_to_mid
+from spiders.pagination import FanoutPaginationMixin
 
-class RepostSpider(Spider):
+class RepostSpider(FanoutPaginationMixin, Spider):
     """
     微博转发数据采集
+    按接口返回的 max_page / total_number 规划页数，同一条微博的多页并发抓取
     """
     name = "repost"
+    fanout_target_key = 'mid'
 
     def __init__(self, ids_to_process=None, is_single=False, single_id=None, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -19,27 +22,42 @@ class RepostSpider(Spider):
         if not self.ids_to_process:
             self.ids_to_process = ["P5IUOlOur"]  # 仅示例
 
+        # 逐条转换：个别格式错误的 mblogid 只跳过自身，不影响其余目标
         for idx, mblogid in enumerate(self.ids_to_process):
-            mid = url_to_mid(mblogid)
-            url = f"https://weibo.com/ajax/statuses/repostTimeline?id={mid}&page=1&moduleID=feed&count=10"
-            yield Request(
-                url,
-                callback=self.parse,
-                meta={'page_num': 1, 'mid': mid, 'mblogin': mblogid},
-                priority=100000 - idx,
-            )
+            try:
+                mid = url_to_mid(mblogid)
+            except ValueError as exc:
+                self.logger.warning(f"跳过无效的 mblogid：{exc}")
+                continue
+            self._fanout_start(mid)
+            yield self._fanout_request({'mid': mid, 'mblogin': mblogid}, 1, priority=100000 - idx)
+
+    def _fanout_request(self, meta, page_num, priority=0):
+        mid = meta['mid']
+        url = f"https://weibo.com/ajax/statuses/repostTimeline?id={mid}&page={page_num}&moduleID=feed&count=10"
+        return Request(url, callback=self.parse, errback=self._fanout_errback,
+                       meta={'page_num': page_num, 'mid': mid, 'mblogin': meta.get('mblogin')}, priority=priority)
 
     def parse(self, response, **kwargs):
         mblogin = response.meta.get('mblogin')
-        data = json.loads(response.text)
+        try:
+            data = json.loads(response.text)
+        except ValueError as exc:
+            yield from self._fanout_page_failed(response.meta, f"json_error={exc}")
+            return
         for tweet in data.get('data', []):
             item = parse_tweet_info(tweet)
             item['mblogin'] = mblogin
             yield item
 
         # 翻页
-        if data.get('data'):
-            mid, page_num = response.meta['mid'], response.meta['page_num']
-            page_num += 1
-            url = f"https://weibo.com/ajax/statuses/repostTimeline?id={mid}&page={page_num}&moduleID=feed&count=10"
-            yield Request(url, callback=self.parse, meta={'page_num': page_num, 'mid': mid, 'mblogin': mblogin})
+        mid = response.meta['mid']
+        next_pages = self._fanout_next_pages(
+            mid,
+            response.meta['page_num'],
+            len(data.get('data') or []),
+            total=data.get('total_number'),
+            max_page=data.get('max_page'),
+        )
+        for page_num in next_pages:
+            yield self._fanout_request(response.meta, page_num)
@@ -1,7 +1,8 @@
 import datetime
 import json
+import os
 import re
-from collections import defaultdict
+from collections import defaultdict, deque
 from scrapy import Spider, Request
 from spiders.common import parse_tweet_info, extract_longtext_from_mobile
 
@@ -9,6 +10,12 @@ class TweetSpiderByKeyword(Spider):
     """
     关键词搜索采集
     保持原有逻辑与保存方式不变
+    各关键词的时间段进度（已完成时间段、进行中时间段及其页码、失败时间段、各时间段条数）
+    实时写入 KEYWORD_CHECKPOINT_PATH，传入 resume=True（run_spider.py --resume）时跳过已完成部分，
+    重试耗尽而放弃的时间段重新调度；时间段的微博详情全部处理完后才记为已完成
+    每个关键词同时有 KEYWORD_SCOPES_IN_FLIGHT 个时间段在翻页，一个结束后补上下一个
+    KEYWORD_TIMESCOPE_MODE='adaptive' 时时间窗口自适应：达到搜索 50 页上限的窗口对半拆分（最细 1 小时，
+    即 timescope 参数支持的最小粒度），连续 KEYWORD_ADAPTIVE_SPARSE_STREAK 个稀疏窗口后让后续窗口成倍合并
     """
     name = "tweet_spider_by_keyword"
     base_url = "https://s.weibo.com/"
@@ -17,11 +24,178 @@ class TweetSpiderByKeyword(Spider):
     max_search_retry = 3
     max_empty_retry = 3
     max_api_retry = 3
+    # 搜索结果最多展示的页数
+    search_page_cap = 50
+    scope_time_format = '%Y-%m-%d %H'
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, resume=False, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.timescope_queues = {}
         self.scope_counts = defaultdict(int)
+        # 每个时间段已解析的搜索页数，及每个关键词当前进行中的时间段
+        self.scope_pages = defaultdict(int)
+        self.active_scopes = defaultdict(set)
+        # 自适应模式下每个关键词的游标、当前窗口大小与拆分/合并计数
+        self.adaptive = {}
+        self.capped_scopes = set()
+        # 每个时间段各页尚未处理完的详情请求数 {scope_key: {page: n}}；翻页已结束、等待详情的时间段 => 是否失败
+        self.scope_pending = {}
+        self.settling_scopes = {}
+        # 每个时间段最近解析的搜索页；已发出详情请求的微博（同一条微博只请求一次，重复的会被调度器去重丢弃）
+        self.scope_last_page = {}
+        self.requested_tweets = set()
+        self.resume = str(resume).lower() in ('1', 'true', 'yes')
+        self.checkpoint_path = None
+        self.checkpoint = {'keywords': {}}
+
+    # -------- checkpoint --------
+    def _load_checkpoint(self):
+        self.checkpoint_path = self.settings.get(
+            'KEYWORD_CHECKPOINT_PATH', f'../output/checkpoints/{self.name}.json'
+        )
+        checkpoint_dir = os.path.dirname(self.checkpoint_path)
+        if checkpoint_dir:
+            os.makedirs(checkpoint_dir, exist_ok=True)
+        if not self.resume or not os.path.exists(self.checkpoint_path):
+            return
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as exc:
+            self.logger.warning(f"[checkpoint] 读取失败，从头开始: {exc!r}")
+            return
+        self.checkpoint = data
+        self.checkpoint.setdefault('keywords', {})
+        self.scope_counts.update(data.get('scope_counts', {}))
+        for keyword, state in self.checkpoint['keywords'].items():
+            self.logger.info(
+                f"[checkpoint] keyword={keyword} 已完成 {len(state.get('completed', []))} 个时间段，"
+                f"进行中 {state.get('in_flight', {})}，失败待重抓 {state.get('failed', {})}"
+            )
+
+    def _save_checkpoint(self):
+        if not self.checkpoint_path:
+            return
+        self.checkpoint['scope_counts'] = dict(self.scope_counts)
+        # 已调度但尚未解析到任何一页的时间段也记为进行中，续跑时从第 1 页开始
+        for keyword, active in self.active_scopes.items():
+            in_flight = self._keyword_state(keyword)['in_flight']
+            for key in active:
+                in_flight.setdefault(key, 1)
+        fmt = self.scope_time_format
+        for keyword, ad in self.adaptive.items():
+            self._keyword_state(keyword)['adaptive'] = {
+                'cursor': ad['cursor'].strftime(fmt),
+                'end': ad['end'].strftime(fmt),
+                'window_hours': ad['window_hours'],
+                'next_idx': ad['next_idx'],
+                'splits': ad['splits'],
+                'merges': ad['merges'],
+                'sparse_streak': ad['sparse_streak'],
+                'queue': [[scope[0].strftime(fmt), scope[1].strftime(fmt)]
+                          for _, scope in self.timescope_queues.get(keyword, ())],
+            }
+        self.checkpoint['updated_at'] = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        tmp_path = self.checkpoint_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.checkpoint, f, ensure_ascii=False)
+        # 原子替换，崩溃时不会留下写了一半的文件
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _keyword_state(self, keyword):
+        state = self.checkpoint['keywords'].setdefault(keyword, {})
+        state.setdefault('completed', [])
+        state.setdefault('in_flight', {})
+        state.setdefault('failed', {})
+        return state
+
+    def _checkpoint_page(self, meta):
+        keyword = meta.get('keyword')
+        scope = meta.get('current_scope')
+        if not keyword or not scope:
+            return
+        self.scope_last_page[self._scope_key(keyword, scope)] = meta.get('page', 1)
+        self._checkpoint_progress(keyword, scope)
+
+    def _checkpoint_progress(self, keyword, scope):
+        """
+        续跑页码取仍有详情未处理完的最小页，没有则取最近解析的页：
+        崩溃后从该页重抓，不会丢掉前面页尚在途的微博
+        """
+        key = self._scope_key(keyword, scope)
+        if key not in self.active_scopes[keyword] and key not in self.settling_scopes:
+            # 已拆分的父窗口等：不再写回 in_flight
+            return
+        pages = list(self.scope_pending.get(key, ()))
+        if key in self.scope_last_page:
+            pages.append(self.scope_last_page[key])
+        if not pages:
+            return
+        self._keyword_state(keyword)['in_flight'][key] = min(pages)
+        self._save_checkpoint()
+
+    def _checkpoint_done(self, keyword, scope):
+        state = self._keyword_state(keyword)
+        key = self._scope_key(keyword, scope)
+        state['in_flight'].pop(key, None)
+        state['failed'].pop(key, None)
+        if key not in state['completed']:
+            state['completed'].append(key)
+        self._save_checkpoint()
+
+    def _checkpoint_failed(self, keyword, scope):
+        """重试耗尽放弃的时间段单独记录（含放弃时的页码），续跑时重新调度"""
+        state = self._keyword_state(keyword)
+        key = self._scope_key(keyword, scope)
+        page = state['in_flight'].pop(key, 1)
+        state['failed'][key] = page
+        self._save_checkpoint()
+
+    def _settle_scope(self, keyword, scope, failed):
+        """翻页结束后，待该时间段的详情请求全部处理完再写入检查点，期间保留 in_flight 中的页码"""
+        key = self._scope_key(keyword, scope)
+        if self.scope_pending.get(key):
+            self.settling_scopes[key] = failed
+            return
+        self.settling_scopes.pop(key, None)
+        self.scope_last_page.pop(key, None)
+        if failed:
+            self._checkpoint_failed(keyword, scope)
+        else:
+            self._checkpoint_done(keyword, scope)
+
+    def _detail_started(self, meta):
+        keyword = meta.get('keyword')
+        scope = meta.get('current_scope')
+        if keyword and scope:
+            pending = self.scope_pending.setdefault(self._scope_key(keyword, scope), {})
+            page = meta.get('page', 1)
+            pending[page] = pending.get(page, 0) + 1
+
+    def _detail_finished(self, meta):
+        """一条详情（含长文本）处理完或放弃；某页的详情全部结束时推进续跑页码，翻页已结束时落检查点"""
+        keyword = meta.get('keyword')
+        scope = meta.get('current_scope')
+        if not keyword or not scope:
+            return
+        key = self._scope_key(keyword, scope)
+        pending = self.scope_pending.get(key)
+        page = meta.get('page', 1)
+        if not pending or page not in pending:
+            return
+        pending[page] -= 1
+        if pending[page] > 0:
+            return
+        del pending[page]
+        if pending:
+            if page < min(pending):
+                self._checkpoint_progress(keyword, scope)
+            return
+        del self.scope_pending[key]
+        if key in self.settling_scopes:
+            self._settle_scope(keyword, scope, self.settling_scopes[key])
+        else:
+            self._checkpoint_progress(keyword, scope)
 
     def _build_timescopes(self, start_time, end_time, is_split_by_hour=True):
         scopes = []
@@ -40,21 +214,44 @@ class TweetSpiderByKeyword(Spider):
         start_time = datetime.datetime(year=2025, month=11, day=28, hour=12)
         end_time = datetime.datetime(year=2025, month=11, day=28, hour=13)
         is_split_by_hour = True
+        self._load_checkpoint()
+
+        scopes_in_flight = max(1, self.settings.getint('KEYWORD_SCOPES_IN_FLIGHT', 1))
+        adaptive = self.settings.get('KEYWORD_TIMESCOPE_MODE', 'fixed') == 'adaptive'
 
         for keyword in keywords:
-            scopes = self._build_timescopes(start_time, end_time, is_split_by_hour)
-            if not scopes:
+            if adaptive:
+                yield from self._start_adaptive(keyword, start_time, end_time, scopes_in_flight)
                 continue
+            scopes = self._build_timescopes(start_time, end_time, is_split_by_hour)
+            state = self._keyword_state(keyword)
+            completed = set(state['completed'])
             total = len(scopes)
-            first_scope, rest = scopes[0], scopes[1:]
-            self.timescope_queues[keyword] = list(rest)
-            yield self._make_search_request(
-                keyword,
-                first_scope,
-                page=1,
-                scope_idx=0,
-                total_scopes=total
-            )
+            pending = [(idx, scope) for idx, scope in enumerate(scopes)
+                       if self._scope_key(keyword, scope) not in completed]
+            if total != len(pending):
+                self.logger.info(f"[checkpoint] keyword={keyword} 跳过已完成的 {total - len(pending)}/{total} 个时间段")
+            if not pending:
+                continue
+            # 断点续跑：上次失败的时间段转回进行中，与进行中的时间段一起优先，并从记录的页码继续
+            in_flight = state['in_flight']
+            for key, page in state['failed'].items():
+                in_flight.setdefault(key, page)
+            state['failed'].clear()
+            pending.sort(key=lambda entry: self._scope_key(keyword, entry[1]) not in in_flight)
+            queue = deque(pending)
+            self.timescope_queues[keyword] = queue
+            while queue and len(self.active_scopes[keyword]) < scopes_in_flight:
+                idx, scope = queue.popleft()
+                self.active_scopes[keyword].add(self._scope_key(keyword, scope))
+                yield self._make_search_request(
+                    keyword,
+                    scope,
+                    page=in_flight.get(self._scope_key(keyword, scope), 1),
+                    scope_idx=idx,
+                    total_scopes=total
+                )
+        self._save_checkpoint()
 
     def parse(self, response, **kwargs):
         if response.status >= 400:
@@ -62,7 +259,7 @@ class TweetSpiderByKeyword(Spider):
             if retry_req:
                 yield retry_req
             else:
-                yield from self._finish_and_advance(response.meta)
+                yield from self._finish_and_advance(response.meta, failed=True)
             return
 
         html = response.text
@@ -76,6 +273,38 @@ class TweetSpiderByKeyword(Spider):
         if not tweets_infos:
             yield from self._handle_empty_search_page(response)
             return
+        self._inc_scope_page(response.meta)
+        if self._should_split_scope(response.meta, html):
+            # 拆分后由子窗口重新抓取，父窗口当前页不再处理
+            yield from self._split_scope(response.meta)
+            return
+        self._checkpoint_page(response.meta)
+
+        # 先登记本页的详情请求，时间段要等它们处理完才记为已完成
+        detail_requests = []
+        for tweets_info in tweets_infos:
+            tweet_ids = re.findall(r'weibo\.com/\d+/(.+?)\?refer_flag=1001030103_" ', tweets_info)
+            for tweet_id in tweet_ids:
+                # 重复出现的微博（其它关键词 / 其它页）不再请求：调度器会静默丢弃，详情计数将永远不归零
+                if tweet_id in self.requested_tweets:
+                    continue
+                self.requested_tweets.add(tweet_id)
+                url = f"https://weibo.com/ajax/statuses/show?id={tweet_id}&is_all=1&ajwvr=6"
+                headers = {
+                    'Referer': 'https://weibo.com/',
+                    'X-Requested-With': 'XMLHttpRequest',
+                }
+                meta = dict(response.meta)
+                meta['debug_label'] = 'show_api'
+                self._detail_started(meta)
+                detail_requests.append(Request(
+                    url,
+                    callback=self.parse_tweet,
+                    meta=meta,
+                    priority=10,
+                    headers=headers,
+                    errback=self._handle_api_error
+                ))
 
         # 优先处理分页或下一个时间段的调度，确保主线任务不断
         next_page = re.search('<a href="(.*?)" class="next">下一页</a>', html)
@@ -92,88 +321,86 @@ class TweetSpiderByKeyword(Spider):
             yield from self._finish_and_advance(response.meta)
 
         # 处理当前页的微博
-        for tweets_info in tweets_infos:
-            tweet_ids = re.findall(r'weibo\.com/\d+/(.+?)\?refer_flag=1001030103_" ', tweets_info)
-            for tweet_id in tweet_ids:
-                url = f"https://weibo.com/ajax/statuses/show?id={tweet_id}&is_all=1&ajwvr=6"
+        yield from detail_requests
+
+    def parse_tweet(self, response):
+        # 除了交给重试或长文本请求的情况，无论成功、放弃还是解析异常（如已删除微博的 {"ok":0}），都要结束该条详情
+        handed_off = False
+        try:
+            if response.status >= 400:
+                retry_req = self._retry_api_request(response.request, f"http_status={response.status}")
+                if retry_req:
+                    handed_off = True
+                    yield retry_req
+                return
+            try:
+                data = json.loads(response.text)
+            except Exception as exc:
+                retry_req = self._retry_api_request(response.request, f"json_error={exc}")
+                if retry_req:
+                    handed_off = True
+                    yield retry_req
+                return
+
+            item = parse_tweet_info(data)
+            item['keyword'] = response.meta['keyword']
+            # 优先使用接口返回的全文
+            long_text = data.get('longText') or {}
+            if isinstance(long_text, dict) and long_text.get('longTextContent'):
+                item['content'] = long_text.get('longTextContent')
+                item['longTextExpanded'] = True
+            elif data.get('longTextContent'):
+                item['content'] = data.get('longTextContent')
+                item['longTextExpanded'] = True
+
+            if item['isLongText'] and not item.get('longTextExpanded'):
+                mobile_url = f"https://m.weibo.cn/detail/{item['mblogid']}"
                 headers = {
-                    'Referer': 'https://weibo.com/',
-                    'X-Requested-With': 'XMLHttpRequest',
+                    'Referer': 'https://m.weibo.cn/',
+                    'User-Agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 15_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.0 Mobile/15E148 Safari/604.1',
                 }
-                meta = dict(response.meta)
-                meta['debug_label'] = 'show_api'
+                handed_off = True
                 yield Request(
-                    url,
-                    callback=self.parse_tweet,
-                    meta=meta,
-                    priority=10,
+                    mobile_url,
+                    callback=self.parse_longtext_mobile,
+                    meta={**response.meta, 'item': item, 'debug_label': 'longtext_mobile', 'longtext_retry_times': 0},
                     headers=headers,
-                    errback=self._handle_api_error
+                    priority=20,
+                    errback=self._handle_longtext_error
                 )
+            else:
+                self._inc_scope_count(response.meta)
+                yield item
+        finally:
+            if not handed_off:
+                self._detail_finished(response.meta)
 
-    def parse_tweet(self, response):
-        if response.status >= 400:
-            retry_req = self._retry_api_request(response.request, f"http_status={response.status}")
-            if retry_req:
-                yield retry_req
-            return
+    def parse_longtext_mobile(self, response):
+        handed_off = False
         try:
-            data = json.loads(response.text)
-        except Exception as exc:
-            retry_req = self._retry_api_request(response.request, f"json_error={exc}")
-            if retry_req:
-                yield retry_req
-            return
+            if response.status >= 400:
+                retry_req = self._retry_api_request(
+                    response.request,
+                    f"http_status={response.status}",
+                    retry_key='longtext_retry_times'
+                )
+                if retry_req:
+                    handed_off = True
+                    yield retry_req
+                else:
+                    yield response.meta['item']
+                return
 
-        item = parse_tweet_info(data)
-        item['keyword'] = response.meta['keyword']
-        # 优先使用接口返回的全文
-        long_text = data.get('longText') or {}
-        if isinstance(long_text, dict) and long_text.get('longTextContent'):
-            item['content'] = long_text.get('longTextContent')
-            item['longTextExpanded'] = True
-        elif data.get('longTextContent'):
-            item['content'] = data.get('longTextContent')
-            item['longTextExpanded'] = True
-
-        if item['isLongText'] and not item.get('longTextExpanded'):
-            mobile_url = f"https://m.weibo.cn/detail/{item['mblogid']}"
-            headers = {
-                'Referer': 'https://m.weibo.cn/',
-                'User-Agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 15_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.0 Mobile/15E148 Safari/604.1',
-            }
-            yield Request(
-                mobile_url,
-                callback=self.parse_longtext_mobile,
-                meta={**response.meta, 'item': item, 'debug_label': 'longtext_mobile', 'longtext_retry_times': 0},
-                headers=headers,
-                priority=20,
-                errback=self._handle_longtext_error
-            )
-        else:
+            item = response.meta['item']
+            content = extract_longtext_from_mobile(response.text)
+            if content:
+                item['content'] = content
+                item['longTextExpanded'] = True
             self._inc_scope_count(response.meta)
             yield item
-
-    def parse_longtext_mobile(self, response):
-        if response.status >= 400:
-            retry_req = self._retry_api_request(
-                response.request,
-                f"http_status={response.status}",
-                retry_key='longtext_retry_times'
-            )
-            if retry_req:
-                yield retry_req
-            else:
-                yield response.meta['item']
-            return
-
-        item = response.meta['item']
-        content = extract_longtext_from_mobile(response.text)
-        if content:
-            item['content'] = content
-            item['longTextExpanded'] = True
-        self._inc_scope_count(response.meta)
-        yield item
+        finally:
+            if not handed_off:
+                self._detail_finished(response.meta)
 
     # -------- helpers --------
     def _make_search_request(self, keyword, timescope, page=1, retry_times=0, scope_idx=0, total_scopes=None):
@@ -208,32 +435,222 @@ class TweetSpiderByKeyword(Spider):
         key = self._scope_key(keyword, scope)
         self.scope_counts[key] += 1
 
-    def _finish_and_advance(self, meta):
+    def _inc_scope_page(self, meta):
+        scope = meta.get('current_scope')
+        keyword = meta.get('keyword')
+        if not scope or not keyword:
+            return
+        self.scope_pages[self._scope_key(keyword, scope)] += 1
+
+    def _finish_and_advance(self, meta, failed=False):
+        """时间段翻页结束，补上下一个时间段；failed 表示重试耗尽放弃，续跑时会重新调度"""
         keyword = meta.get('keyword')
         scope = meta.get('current_scope')
         if keyword and scope:
             key = self._scope_key(keyword, scope)
+            active = self.active_scopes[keyword]
+            if key not in active:
+                # 同一时间段重复结束（例如重试链路交叉），不再额外补位
+                return
+            active.discard(key)
             count = self.scope_counts.get(key, 0)
-            self.logger.info(f"[timescope] keyword={keyword} scope={key} done, items={count}")
+            pages = self.scope_pages.get(key, 0)
+            self.logger.info(
+                f"[timescope] keyword={keyword} scope={key} {'failed' if failed else 'done'}, "
+                f"items={count}, pages={pages}, in_flight={len(active)}"
+            )
+            if keyword in self.adaptive and not failed:
+                self._maybe_merge_windows(keyword, key, pages)
+            self._settle_scope(keyword, scope, failed)
         yield from self._advance_timescope(keyword, meta)
 
+    def _next_scope(self, keyword):
+        """取下一个待抓时间段：先取队列（固定切分的时间段或拆分出的子窗口），自适应模式再按游标生成"""
+        queue = self.timescope_queues.get(keyword)
+        if queue:
+            return queue.popleft()
+        ad = self.adaptive.get(keyword)
+        if not ad or ad['cursor'] >= ad['end']:
+            return None
+        start = ad['cursor']
+        end = min(ad['end'], start + datetime.timedelta(hours=ad['window_hours']))
+        ad['cursor'] = end
+        idx = ad['next_idx']
+        ad['next_idx'] += 1
+        return idx, (start, end)
+
     def _advance_timescope(self, keyword, meta):
         if not keyword:
             return
-        queue = self.timescope_queues.get(keyword, [])
-        if not queue:
-            self.logger.info(f"[timescope] keyword={keyword} all scopes finished.")
+        entry = self._next_scope(keyword)
+        if entry is None:
+            if not self.active_scopes[keyword]:
+                self.logger.info(f"[timescope] keyword={keyword} all scopes finished.")
+                self._log_keyword_summary(keyword)
             return
-        next_scope = queue.pop(0)
-        next_idx = (meta.get('scope_idx') or 0) + 1
-        total_scopes = meta.get('total_scopes')
+        next_idx, next_scope = entry
+        self.active_scopes[keyword].add(self._scope_key(keyword, next_scope))
         yield self._make_search_request(
             keyword,
             next_scope,
             page=1,
             retry_times=0,
             scope_idx=next_idx,
-            total_scopes=total_scopes
+            total_scopes=meta.get('total_scopes')
+        )
+
+    # -------- adaptive timescope --------
+    def _scope_from_key(self, key):
+        _, times = key.rsplit(':', 1)
+        start, end = times.split('->')
+        fmt = self.scope_time_format
+        return datetime.datetime.strptime(start, fmt), datetime.datetime.strptime(end, fmt)
+
+    @staticmethod
+    def _scope_hours(scope):
+        return int((scope[1] - scope[0]) // datetime.timedelta(hours=1))
+
+    def _start_adaptive(self, keyword, start_time, end_time, scopes_in_flight):
+        settings = self.settings
+        state = self._keyword_state(keyword)
+        fmt = self.scope_time_format
+        ad = {
+            'cursor': start_time,
+            'end': end_time,
+            'window_hours': max(1, settings.getint('KEYWORD_ADAPTIVE_INITIAL_HOURS', 6)),
+            'max_hours': max(1, settings.getint('KEYWORD_ADAPTIVE_MAX_HOURS', 72)),
+            'sparse_pages': settings.getint('KEYWORD_ADAPTIVE_SPARSE_PAGES', 1),
+            'sparse_streak_needed': max(1, settings.getint('KEYWORD_ADAPTIVE_SPARSE_STREAK', 2)),
+            'sparse_streak': 0,
+            'next_idx': 0,
+            'splits': 0,
+            'merges': 0,
+        }
+        queue = deque()
+        saved = state.get('adaptive')
+        if saved and saved.get('end') == end_time.strftime(fmt):
+            # 断点续跑：恢复游标、窗口大小与尚未开始的子窗口
+            ad['cursor'] = datetime.datetime.strptime(saved['cursor'], fmt)
+            for key in ('window_hours', 'next_idx', 'splits', 'merges', 'sparse_streak'):
+                ad[key] = saved.get(key, ad[key])
+            for start, end in saved.get('queue', []):
+                queue.append((ad['next_idx'], (datetime.datetime.strptime(start, fmt),
+                                               datetime.datetime.strptime(end, fmt))))
+                ad['next_idx'] += 1
+        self.adaptive[keyword] = ad
+        self.timescope_queues[keyword] = queue
+
+        for key, page in state['failed'].items():
+            state['in_flight'].setdefault(key, page)
+        state['failed'].clear()
+        for key, page in list(state['in_flight'].items()):
+            scope = self._scope_from_key(key)
+            self.active_scopes[keyword].add(key)
+            yield self._make_search_request(keyword, scope, page=page, scope_idx=ad['next_idx'])
+            ad['next_idx'] += 1
+        while len(self.active_scopes[keyword]) < scopes_in_flight:
+            entry = self._next_scope(keyword)
+            if entry is None:
+                break
+            idx, scope = entry
+            self.active_scopes[keyword].add(self._scope_key(keyword, scope))
+            yield self._make_search_request(keyword, scope, page=1, scope_idx=idx)
+
+    @staticmethod
+    def _max_search_page(html):
+        """从分页下拉列表中读取总页数，页面上没有分页列表时返回 1"""
+        match = re.search(r'<ul class="s-scroll">(.*?)</ul>', html, re.DOTALL)
+        if not match:
+            return 1
+        pages = [int(p) for p in re.findall(r'[?&]page=(\d+)', match.group(1))]
+        return max(pages) if pages else 1
+
+    def _should_split_scope(self, meta, html):
+        keyword = meta.get('keyword')
+        scope = meta.get('current_scope')
+        if keyword not in self.adaptive or not scope:
+            return False
+        page = meta.get('page', 1)
+        key = self._scope_key(keyword, scope)
+        # 首页即可从分页列表得知是否达到上限，只在首页拆分
+        if page != 1:
+            if page >= self.search_page_cap and key not in self.capped_scopes:
+                # 首页没有分页列表、翻到上限页才发现：前面的页已抓完，拆分会整段重抓，
+                # 因此不拆分当前窗口，只缩小后续窗口
+                self.capped_scopes.add(key)
+                ad = self.adaptive[keyword]
+                ad['window_hours'] = max(1, min(ad['window_hours'], self._scope_hours(scope) // 2))
+                ad['sparse_streak'] = 0
+                self.logger.warning(
+                    f"[adaptive] keyword={keyword} scope={key} 首页无分页列表，翻到 {self.search_page_cap} 页上限才发现，"
+                    f"不再拆分（超出上限的部分可能遗漏），后续窗口 {ad['window_hours']} 小时"
+                )
+            return False
+        if self._max_search_page(html) < self.search_page_cap:
+            return False
+        if self._scope_hours(scope) <= 1:
+            if key not in self.capped_scopes:
+                self.capped_scopes.add(key)
+                self.logger.warning(
+                    f"[adaptive] keyword={keyword} scope={key} 已是最小粒度 1 小时，"
+                    f"仍达到 {self.search_page_cap} 页上限，可能有遗漏"
+                )
+            return False
+        return True
+
+    def _split_scope(self, meta):
+        keyword = meta['keyword']
+        scope = meta['current_scope']
+        key = self._scope_key(keyword, scope)
+        hours = self._scope_hours(scope)
+        mid = scope[0] + datetime.timedelta(hours=hours // 2)
+        ad = self.adaptive[keyword]
+        queue = self.timescope_queues[keyword]
+        for child in ((mid, scope[1]), (scope[0], mid)):
+            queue.appendleft((ad['next_idx'], child))
+            ad['next_idx'] += 1
+        ad['window_hours'] = max(1, min(ad['window_hours'], hours // 2))
+        ad['sparse_streak'] = 0
+        ad['splits'] += 1
+        self.logger.info(
+            f"[adaptive] keyword={keyword} scope={key} 达到 {self.search_page_cap} 页上限，拆分为 "
+            f"{self._scope_key(keyword, (scope[0], mid))} + {self._scope_key(keyword, (mid, scope[1]))}，"
+            f"后续窗口 {ad['window_hours']} 小时"
+        )
+        # 父窗口不计为完成，由子窗口接替
+        self.active_scopes[keyword].discard(key)
+        self.scope_last_page.pop(key, None)
+        self._keyword_state(keyword)['in_flight'].pop(key, None)
+        self._save_checkpoint()
+        yield from self._advance_timescope(keyword, meta)
+
+    def _maybe_merge_windows(self, keyword, key, pages):
+        """连续 sparse_streak_needed 个窗口都稀疏时才把后续窗口加倍，单个稀疏窗口不影响"""
+        ad = self.adaptive[keyword]
+        if pages > ad['sparse_pages']:
+            ad['sparse_streak'] = 0
+            return
+        ad['sparse_streak'] += 1
+        if ad['sparse_streak'] < ad['sparse_streak_needed'] or ad['window_hours'] >= ad['max_hours']:
+            return
+        ad['sparse_streak'] = 0
+        ad['window_hours'] = min(ad['max_hours'], ad['window_hours'] * 2)
+        ad['merges'] += 1
+        self.logger.info(
+            f"[adaptive] keyword={keyword} scope={key} 连续 {ad['sparse_streak_needed']} 个窗口不超过 "
+            f"{ad['sparse_pages']} 页，较稀疏，后续窗口合并为 {ad['window_hours']} 小时"
+        )
+
+    def _log_keyword_summary(self, keyword):
+        prefix = f"{keyword}:"
+        pages = sum(v for k, v in self.scope_pages.items() if k.startswith(prefix))
+        items = sum(v for k, v in self.scope_counts.items() if k.startswith(prefix))
+        ad = self.adaptive.get(keyword)
+        mode = 'adaptive' if ad else 'fixed'
+        extra = f", splits={ad['splits']}, merges={ad['merges']}" if ad else ''
+        self.logger.info(
+            f"[timescope] keyword={keyword} mode={mode} search_pages={pages}, items={items}, "
+            f"items_per_page={items / pages if pages else 0:.2f}{extra}"
         )
 
     def _retry_search_request(self, request, reason):
@@ -264,7 +681,12 @@ class TweetSpiderByKeyword(Spider):
         self.logger.info(
             f"[search] empty page reached limit, move next scope. url={response.url}"
         )
-        yield from self._finish_and_advance(meta)
+        # 已解析过页面，或超出 50 页上限后的空页，是时间段的正常结束；一页都没拿到才算失败
+        keyword = meta.get('keyword')
+        scope = meta.get('current_scope')
+        parsed = bool(keyword and scope and self.scope_pages.get(self._scope_key(keyword, scope)))
+        failed = not parsed and meta.get('page', 1) <= self.search_page_cap
+        yield from self._finish_and_advance(meta, failed=failed)
 
     def _handle_search_error(self, failure):
         request = failure.request
@@ -273,7 +695,7 @@ class TweetSpiderByKeyword(Spider):
         if retry_req:
             yield retry_req
             return
-        yield from self._finish_and_advance(request.meta)
+        yield from self._finish_and_advance(request.meta, failed=True)
 
     def _retry_api_request(self, request, reason, retry_key='api_retry_times'):
         retry_times = request.meta.get(retry_key, 0)
@@ -295,6 +717,8 @@ class TweetSpiderByKeyword(Spider):
         )
         if retry_req:
             yield retry_req
+        else:
+            self._detail_finished(failure.request.meta)
 
     def _handle_longtext_error(self, failure):
         retry_req = self._retry_api_request(
@@ -305,4 +729,5 @@ class TweetSpiderByKeyword(Spider):
         if retry_req:
             yield retry_req
         else:
+            self._detail_finished(failure.request.meta)
             yield failure.request.meta.get('item')
@@ -1,5 +1,6 @@
 import datetime
 import json
+from collections import defaultdict
 from scrapy import Spider
 from scrapy.http import Request
 from spiders.common import parse_tweet_info, extract_longtext_from_mobile
@@ -7,14 +8,44 @@ from spiders.common import parse_tweet_info, extract_longtext_from_mobile
 class TweetSpiderByUserID(Spider):
     """
     用户推文数据采集
+    指定时间段时，每个用户同时有 USER_TWEET_WINDOWS_IN_FLIGHT 个时间窗口在翻页，结束一个补一个，
+    新窗口的大小根据已结束窗口的发博密度自适应：
+    - 活跃用户缩小窗口，减少深度翻页；不活跃用户放大窗口，减少空请求
+    - 窗口首尾相接，不再遗漏窗口之间的日期
+    - 接口返回 total 时，取满即停，不再多请求一次空页
+    - 某页请求失败（风控状态码、下载异常、非 JSON、缺少 data.list）只结束该窗口，按当前窗口大小继续后续窗口
+    关闭时输出每个用户及整体的 请求数/微博数/失败窗口数
     """
     name = "tweet_spider_by_user_id"
+    base_url = "https://weibo.com/ajax/statuses/searchProfile"
+    # 风控 / 错误状态也进入回调，结束当前窗口并推进后续窗口
+    handle_httpstatus_list = [403, 418, 429, 500, 502, 503, 504]
 
     def __init__(self, ids_to_process=None, is_single=False, single_id=None, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.ids_to_process = ids_to_process or []
         self.is_single = is_single
         self.single_id = single_id
+        self.request_counts = defaultdict(int)
+        self.longtext_request_counts = defaultdict(int)
+        self.tweet_counts = defaultdict(int)
+        self.failed_windows = defaultdict(int)
+        # 每个用户的窗口游标、区间终点、当前窗口天数与进行中的窗口数
+        self.user_windows = {}
+
+    def _list_url(self, user_id, page, window=None):
+        url = f"{self.base_url}?uid={user_id}&page={page}&hasori=1&hastext=1&haspic=1&hasvideo=1&hasmusic=1&hasret=1"
+        if window:
+            url += f"&starttime={int(window[0].timestamp())}&endtime={int(window[1].timestamp())}"
+        return url
+
+    def _list_request(self, user_id, page, window=None, window_tweets=0, priority=0):
+        self.request_counts[user_id] += 1
+        meta = {'user_id': user_id, 'page_num': page}
+        if window:
+            meta.update({'window': window, 'window_tweets': window_tweets})
+        return Request(self._list_url(user_id, page, window), callback=self.parse, errback=self._handle_list_error,
+                       meta=meta, priority=priority)
 
     def start_requests(self):
         # 若外部无传入，则仅示例一个 ID
@@ -25,25 +56,36 @@ class TweetSpiderByUserID(Spider):
         is_crawl_specific_time_span = True
         start_time = datetime.datetime(year=2022, month=1, day=1)
         end_time = datetime.datetime(year=2023, month=1, day=1)
+        initial_days = self.settings.getint('USER_TWEET_WINDOW_INITIAL_DAYS', 10)
 
         for idx, user_id in enumerate(self.ids_to_process):
-            url = f"https://weibo.com/ajax/statuses/searchProfile?uid={user_id}&page=1&hasori=1&hastext=1&haspic=1&hasvideo=1&hasmusic=1&hasret=1"
             if not is_crawl_specific_time_span:
-                yield Request(url, callback=self.parse, meta={'user_id': user_id, 'page_num': 1}, priority=100000 - idx)
+                yield self._list_request(user_id, 1, priority=100000 - idx)
             else:
-                tmp_start_time = start_time
-                while tmp_start_time <= end_time:
-                    tmp_end_time = tmp_start_time + datetime.timedelta(days=10)
-                    tmp_end_time = min(tmp_end_time, end_time)
-                    tmp_url = url + f"&starttime={int(tmp_start_time.timestamp())}&endtime={int(tmp_end_time.timestamp())}"
-                    yield Request(tmp_url, callback=self.parse, meta={'user_id': user_id, 'page_num': 1}, priority=100000 - idx)
-                    tmp_start_time = tmp_end_time + datetime.timedelta(days=1)
+                self.user_windows[user_id] = {
+                    'cursor': start_time,
+                    'end': end_time,
+                    'days': initial_days,
+                    'in_flight': 0,
+                    'priority': 100000 - idx,
+                }
+                yield from self._fill_windows(user_id)
 
     def parse(self, response, **kwargs):
-        data = json.loads(response.text)
-        if 'data' not in data or 'list' not in data['data']:
+        user_id = response.meta['user_id']
+        if response.status >= 400:
+            yield from self._window_failed(response.meta, f"http_status={response.status}")
+            return
+        try:
+            data = json.loads(response.text)
+        except ValueError as exc:
+            yield from self._window_failed(response.meta, f"json_error={exc}")
+            return
+        if not isinstance(data.get('data'), dict) or 'list' not in data['data']:
+            yield from self._window_failed(response.meta, "missing data.list")
             return
         tweets = data['data']['list']
+        self.tweet_counts[user_id] += len(tweets)
         for tweet in tweets:
             item = parse_tweet_info(tweet)
             # 这里演示移除 user 信息后再yield
@@ -55,6 +97,7 @@ class TweetSpiderByUserID(Spider):
                     'Referer': 'https://m.weibo.cn/',
                     'User-Agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 15_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.0 Mobile/15E148 Safari/604.1',
                 }
+                self.longtext_request_counts[user_id] += 1
                 yield Request(
                     mobile_url,
                     callback=self.parse_longtext_mobile,
@@ -64,11 +107,100 @@ class TweetSpiderByUserID(Spider):
             else:
                 yield item
 
-        if tweets:
-            user_id = response.meta['user_id']
-            page_num = response.meta['page_num'] + 1
-            next_url = response.url.replace(f"page={response.meta['page_num']}", f"page={page_num}")
-            yield Request(next_url, callback=self.parse, meta={'user_id': user_id, 'page_num': page_num})
+        window = response.meta.get('window')
+        page_num = response.meta['page_num']
+        if not window:
+            if tweets:
+                yield self._list_request(user_id, page_num + 1)
+            return
+
+        window_tweets = response.meta.get('window_tweets', 0) + len(tweets)
+        total = data['data'].get('total')
+        # 有 total 时取满即停，否则翻到空页为止
+        window_done = not tweets or (isinstance(total, int) and window_tweets >= total)
+        if not window_done:
+            yield self._list_request(user_id, page_num + 1, window, window_tweets)
+            return
+        self._update_window_days(user_id, window, window_tweets)
+        yield from self._window_finished(user_id)
+
+    def _fill_windows(self, user_id):
+        """按当前窗口天数补足该用户进行中的窗口，窗口首尾相接"""
+        state = self.user_windows.get(user_id)
+        if not state:
+            return
+        limit = max(1, self.settings.getint('USER_TWEET_WINDOWS_IN_FLIGHT', 4))
+        while state['in_flight'] < limit and state['cursor'] < state['end']:
+            start = state['cursor']
+            end = min(state['end'], start + datetime.timedelta(days=state['days']))
+            state['cursor'] = end
+            state['in_flight'] += 1
+            yield self._list_request(user_id, 1, (start, end), priority=state['priority'])
+
+    def _window_finished(self, user_id):
+        state = self.user_windows.get(user_id)
+        if not state:
+            return
+        state['in_flight'] -= 1
+        yield from self._fill_windows(user_id)
+        if not state['in_flight']:
+            del self.user_windows[user_id]
+
+    def _update_window_days(self, user_id, window, window_tweets):
+        """根据刚结束窗口的发博密度更新后续窗口的天数"""
+        state = self.user_windows.get(user_id)
+        if not state:
+            return
+        settings = self.settings
+        min_days = max(1, settings.getint('USER_TWEET_WINDOW_MIN_DAYS', 1))
+        max_days = max(min_days, settings.getint('USER_TWEET_WINDOW_MAX_DAYS', 180))
+        target = max(1, settings.getint('USER_TWEET_WINDOW_TARGET_TWEETS', 60))
+        days = max((window[1] - window[0]).total_seconds() / 86400, 1 / 24)
+        if window_tweets:
+            next_days = target / (window_tweets / days)
+        else:
+            # 空窗口：用户在这段时间不活跃，后续窗口加倍
+            next_days = days * 2
+        state['days'] = min(max_days, max(min_days, next_days))
+        self.logger.debug(
+            f"[window] uid={user_id} {window[0]:%Y-%m-%d}~{window[1]:%Y-%m-%d} tweets={window_tweets}, "
+            f"next {state['days']:.1f} days"
+        )
+
+    def _window_failed(self, meta, reason):
+        """某页失败只放弃该窗口余下的页，后续窗口沿用当前窗口天数继续"""
+        user_id = meta['user_id']
+        window = meta.get('window')
+        self.logger.warning(
+            f"[window] uid={user_id} page={meta.get('page_num')} "
+            f"window={f'{window[0]:%Y-%m-%d}~{window[1]:%Y-%m-%d}' if window else None} failed, reason={reason}"
+        )
+        if not window:
+            return
+        self.failed_windows[user_id] += 1
+        yield from self._window_finished(user_id)
+
+    def _handle_list_error(self, failure):
+        yield from self._window_failed(failure.request.meta, repr(getattr(failure, 'value', failure)))
+
+    def closed(self, reason):
+        total_requests = 0
+        total_tweets = 0
+        for user_id, requests in self.request_counts.items():
+            tweets = self.tweet_counts.get(user_id, 0)
+            requests += self.longtext_request_counts.get(user_id, 0)
+            total_requests += requests
+            total_tweets += tweets
+            self.logger.info(
+                f"[window] uid={user_id} requests={requests}, tweets={tweets}, "
+                f"requests_per_tweet={requests / tweets if tweets else float('inf'):.3f}, "
+                f"failed_windows={self.failed_windows.get(user_id, 0)}"
+            )
+        if total_requests:
+            self.logger.info(
+                f"[window] total requests={total_requests}, tweets={total_tweets}, "
+                f"requests_per_tweet={total_requests / total_tweets if total_tweets else float('inf'):.3f}"
+            )
 
     def parse_longtext_mobile(self, response):
         item = response.meta['item']
@@ -1,5 +1,6 @@
 # user.py
 import json
+import os
 from scrapy import Spider
 from scrapy.http import Request
 from spiders.common import parse_user_info
@@ -10,6 +11,8 @@ class UserSpider(Spider):
     支持：
     - 外部传入 user_id 列表
     - 外部传入 mblogid 列表（先抓取微博详情获取发布者 user_id）
+    同一作者的多条 mblogid 只抓取一次 profile：已完成的 uid 直接合并，进行中的 uid 把后来者记为等待方，
+    抓取失败时由一个等待方重新发起；mblogid => uid 映射持久化到 USER_UID_CACHE_PATH，已知作者跳过 statuses/show
     """
     name = "user"
 
@@ -18,16 +21,100 @@ class UserSpider(Spider):
         self.ids_to_process = ids_to_process or []
         self.is_single = is_single
         self.single_id = single_id
+        # 进行中或已完成的 uid；已产出 item 的 uid；进行中 uid 的等待方（合并进来的 mblogid，直接传 uid 的记 None）
+        self.requested_uids = set()
+        self.done_uids = set()
+        self.uid_waiters = {}
+        self.uid_cache = {}
+        self.uid_cache_file = None
+        self.uid_cache_hits = 0
+        self.coalesced = 0
+
+    def _load_uid_cache(self):
+        path = self.settings.get('USER_UID_CACHE_PATH', '../output/cache/mblogid_uid.tsv')
+        cache_dir = os.path.dirname(path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    parts = line.rstrip('\n').split('\t')
+                    if len(parts) == 2 and parts[1]:
+                        self.uid_cache[parts[0]] = parts[1]
+        # 追加写入：中途崩溃也只丢最后一批未落盘的映射
+        self.uid_cache_file = open(path, 'a', encoding='utf-8')
+        self.logger.info(f"[uid_cache] 已加载 {len(self.uid_cache)} 条 mblogid => uid 映射")
+
+    def _remember_uid(self, mblogid, uid):
+        if not mblogid or self.uid_cache.get(mblogid) == uid:
+            return
+        self.uid_cache[mblogid] = uid
+        if self.uid_cache_file:
+            self.uid_cache_file.write(f"{mblogid}\t{uid}\n")
+
+    def _profile_request(self, uid, priority=0, source=None):
+        """
+        同一 uid 只发一次 profile 请求，返回 None 表示已合并到进行中/已完成的请求；
+        合并到进行中请求的调用方记为等待方，请求失败时用于重试
+        """
+        if uid in self.requested_uids:
+            self.coalesced += 1
+            if uid not in self.done_uids:
+                self.uid_waiters.setdefault(uid, []).append(source)
+            return None
+        self.requested_uids.add(uid)
+        profile_url = f"https://weibo.com/ajax/profile/info?uid={uid}"
+        # 去重由 requested_uids 负责；失败重试的 URL 相同，不能被调度器的去重过滤掉
+        return Request(profile_url, callback=self.parse_profile, errback=self._handle_profile_error,
+                       meta={'user_id': uid, 'source': source}, priority=priority, dont_filter=True)
+
+    def _release_uid(self, uid, reason):
+        """
+        profile / detail 失败：释放 uid；有等待方时由其中一个重新发起（每个合并进来的调用方对应一次重试），
+        没有等待方时留给同一作者后续的 mblogid
+        """
+        self.logger.warning(f"Profile request failed for user_id {uid}: {reason}")
+        self.requested_uids.discard(uid)
+        waiters = self.uid_waiters.get(uid)
+        if not waiters:
+            self.uid_waiters.pop(uid, None)
+            return
+        source = waiters.pop(0)
+        self.coalesced -= 1
+        request = self._profile_request(uid, source=source)
+        self.logger.info(f"Retry profile for user_id {uid} on behalf of {source or uid}, {len(waiters)} still waiting")
+        yield request
+
+    def _handle_profile_error(self, failure):
+        """profile / detail 请求的 HTTP 错误、下载异常"""
+        yield from self._release_uid(failure.request.meta.get('user_id'), failure.getErrorMessage())
+
+    def closed(self, reason):
+        if self.uid_cache_file:
+            self.uid_cache_file.close()
+            self.uid_cache_file = None
+        self.logger.info(
+            f"[uid_cache] 命中 {self.uid_cache_hits} 次（跳过 statuses/show），"
+            f"合并重复 uid 的 profile 请求 {self.coalesced} 次，共请求 {len(self.requested_uids)} 个用户"
+        )
 
     def start_requests(self):
         # 若外部未指定，则使用默认示例 user_id
         if not self.ids_to_process:
             self.logger.info("No IDs provided, using example user ID.")
             self.ids_to_process = ['6148092570']
+        self._load_uid_cache()
 
         for idx, identifier in enumerate(self.ids_to_process):
             # 如果 identifier 包含字母，视为微博 mblogid，先抓微博详情获取 user_id
             if any(c.isalpha() for c in identifier):
+                cached_uid = self.uid_cache.get(identifier)
+                if cached_uid:
+                    self.uid_cache_hits += 1
+                    request = self._profile_request(cached_uid, priority=100000 - idx, source=identifier)
+                    if request:
+                        yield request
+                    continue
                 tweet_url = f"https://weibo.com/ajax/statuses/show?id={identifier}"
                 yield Request(
                     tweet_url,
@@ -37,13 +124,9 @@ class UserSpider(Spider):
                 )
             else:
                 # 纯数字，直接当 user_id 处理
-                profile_url = f"https://weibo.com/ajax/profile/info?uid={identifier}"
-                yield Request(
-                    profile_url,
-                    callback=self.parse_profile,
-                    meta={'user_id': identifier},
-                    priority=100000 - idx,
-                )
+                request = self._profile_request(identifier, priority=100000 - idx)
+                if request:
+                    yield request
 
     def parse_tweet(self, response):
         """
@@ -65,9 +148,11 @@ class UserSpider(Spider):
             self.logger.warning(f"Could not extract user ID from tweet {response.meta.get('mblogid')}")
             return
 
+        self._remember_uid(response.meta.get('mblogid'), uid)
         # 继续抓取用户 profile
-        profile_url = f"https://weibo.com/ajax/profile/info?uid={uid}"
-        yield Request(profile_url, callback=self.parse_profile, meta={'user_id': uid})
+        request = self._profile_request(uid, source=response.meta.get('mblogid'))
+        if request:
+            yield request
 
     def parse_profile(self, response):
         """
@@ -76,14 +161,13 @@ class UserSpider(Spider):
         try:
             data_json = json.loads(response.text)
         except json.JSONDecodeError:
-            self.logger.warning(f"Invalid JSON for user_id {response.meta.get('user_id')}")
+            yield from self._release_uid(response.meta.get('user_id'), "invalid JSON")
             return
 
         user_block = data_json.get('data', {})
         if not user_block or 'user' not in user_block:
-            self.logger.warning(
-                f"Missing 'data.user' for user_id {response.meta.get('user_id')}\n"
-                f"{response.text[:100]}..."
+            yield from self._release_uid(
+                response.meta.get('user_id'), f"missing 'data.user': {response.text[:100]}..."
             )
             return
 
@@ -93,10 +177,10 @@ class UserSpider(Spider):
 
         # 请求详情补充
         detail_url = f"https://weibo.com/ajax/profile/detail?uid={item['user_id']}"
-        yield Request(detail_url, callback=self.parse_detail, meta={'item': item})
+        yield Request(detail_url, callback=self.parse_detail, errback=self._handle_profile_error,
+                      meta={'item': item, 'user_id': response.meta.get('user_id')}, dont_filter=True)
 
-    @staticmethod
-    def parse_detail(response):
+    def parse_detail(self, response):
         """
         解析用户详情页，补充字段
         """
@@ -104,6 +188,7 @@ class UserSpider(Spider):
         try:
             data_json = json.loads(response.text)
         except json.JSONDecodeError:
+            yield from self._release_uid(response.meta.get('user_id'), "invalid detail JSON")
             return
 
         data_detail = data_json.get('data', {})
@@ -117,4 +202,7 @@ class UserSpider(Spider):
             item['company'] = data_detail['company']
         if 'education' in data_detail:
             item['education'] = data_detail['education']
+        uid = response.meta.get('user_id')
+        self.done_uids.add(uid)
+        self.uid_waiters.pop(uid, None)
         yield item